@@ -1,35 +1,37 @@
 """This Python script only plots the *median* convergence curves for
     all black-box optimizers (BBO) considered: ES.
 
+    All convergence curves are aggregated (and cached) via `pypoplib.convergence` from the results store
+      (see `pypoplib.results_store`), where the line is the median and the band is the interquartile range
+      across all trials on one shared log-spaced time grid.
+
     https://github.com/Evolutionary-Intelligence/pypop
     https://pypop.readthedocs.io/en/latest/index.html
 """
 import os
-import sys
-import pickle  # for data storage
+import argparse
 
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
 from matplotlib import colors, rcParams
 
-from pypoplib import optimizer
-sys.modules['optimizer'] = optimizer  # for `pickle`
-
-
-def read_pickle(s, f, i):
-    data_folder = 'pypop7_benchmarks_lso'
-    afile = os.path.join(data_folder, 'Algo-' + s + '_Func-' + f + '_Dim-2000_Exp-' + i + '.pickle')
-    with open(afile, 'rb') as handle:
-        return pickle.load(handle)
+from pypoplib.results_store import ResultsStore
+from pypoplib.convergence import get_time_grid, aggregate
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--store', type=str, default='pypop7_benchmarks_lso')  # folder of the results store
+    parser.add_argument('--cache', type=str, default='.convergence_cache')  # folder of all cached aggregates
+    parser.add_argument('--save', type=str)  # folder to save all figures (e.g., 'figures') rather than show them
+    parser.add_argument('--log_time', action='store_true')  # to plot running time in log scale (opt-in)
+    parser.add_argument('--bands', action='store_true')  # to plot interquartile bands across trials (opt-in)
+    args = parser.parse_args()
     sns.set_theme(style='darkgrid')
     plt.rcParams['font.family'] = 'Times New Roman'
     plt.rcParams['font.size'] = '12'
 
-    n_trials = 10
     algos = ['LMCMA', 'MMES', 'FCMAES', 'DDCMA', 'LMMAES',
         'RMES', 'R1ES', 'VKDCMA', 'VDCMA', 'LMCMAES',
         'FMAES', 'MAES', 'CCMAES2016', 'OPOA2015', 'OPOA2010',
@@ -42,51 +44,42 @@ if __name__ == '__main__':
         c.append(colors[i])  # for better colors
     funcs = ['sphere', 'cigar', 'discus', 'cigar_discus', 'ellipsoid',
         'different_powers', 'schwefel221', 'step', 'rosenbrock', 'schwefel12']
+    store, grid = ResultsStore(args.store), get_time_grid()
     for k, f in enumerate(funcs):
         print('* {:s} ***'.format(f))
-        time, fitness = [], []
-        for j in range(len(algos)):  # initialize
-            time.append([])
-            fitness.append([])
-            for i in range(n_trials):
-                time[j].append([])
-                fitness[j].append([])
-        for i in range(n_trials):
-            b = []
-            for j, a in enumerate(algos):
-                results = read_pickle(a, f, str(i + 1))
-                b.append(results['best_so_far_y'])
-                time[j][i] = results['fitness'][:, 0]*results['runtime']/results['n_function_evaluations']
-                y = results['fitness'][:, 1]
-                for i_y in range(1, len(y)):  # for best-so-far fitness curve
-                    if y[i_y] > y[i_y - 1]:
-                         y[i_y] = y[i_y - 1]
-                fitness[j][i] = y
-            for j, b in enumerate(b):
-                print('{:s}: {:5.2e} '.format(algos[j], b), end='')
-            print()
+        results = aggregate(store, f, algos, grid, scale='n_function_evaluations', cache=args.cache)
+        found = [a for a in algos if len(results[a]['end_runtime']) > 0]  # to skip all optimizers without any trial
+        for a in found:
+            print('{:s}: {:5.2e} '.format(a, np.nanmedian(results[a]['end_fitness'])), end='')
+        print()
         plt.figure(figsize=(5, 5))
         plt.yscale('log')
+        if args.log_time:
+            plt.xscale('log')
         top_ranked = []
-        for j, a in enumerate(algos):
-            end_runtime = [time[j][i][-1] for i in range(len(time[j]))]
-            end_fit = [fitness[j][i][-1] for i in range(len(fitness[j]))]
-            order = np.argsort(end_runtime)[int(n_trials/2)]  # for median (but non-standard)
-            _r = end_runtime[order] if end_runtime[order] <= max_runtime else max_runtime
-            _f = end_fit[order] if end_fit[order] >= fitness_threshold else fitness_threshold 
+        for a in found:
+            _r = min(np.nanmedian(results[a]['end_runtime']), max_runtime)
+            _f = max(np.nanmedian(results[a]['end_fitness']), fitness_threshold)
             top_ranked.append([_r, _f, a])
         top_ranked.sort(key= lambda x: (x[0], x[1]))  # sort by first runtime then fitness
         top_ranked = [t for t in [tr[2] for tr in top_ranked]]
         print('  #top:', top_ranked)
         for j, a in enumerate(algos):
-            end_runtime = [time[j][i][-1] for i in range(len(time[j]))]
-            order = np.argsort(end_runtime)[int(n_trials/2)]  # for median (but non-standard)
+            if a not in found:
+                continue
+            lower, median, upper = results[a]['quantiles']
+            if args.bands:
+                plt.fill_between(grid, lower, upper, color=c[j], alpha=0.2, linewidth=0)
             if a in top_ranked:
-                plt.plot(time[j][order], fitness[j][order], label=a, color=c[j])
+                plt.plot(grid, median, label=a, color=c[j])
             else:
-                plt.plot(time[j][order], fitness[j][order], color=c[j])
+                plt.plot(grid, median, color=c[j])
         plt.xlabel('Running Time (Seconds)')
         plt.ylabel('Fitness')
         plt.title(f)
         # plt.legend(loc=4, ncol=6)
-        plt.show()
+        if args.save is None:
+            plt.show()
+        else:
+            plt.savefig(os.path.join(args.save, 'es_{:d}.png'.format(k + 1)), bbox_inches='tight')
+            plt.close()
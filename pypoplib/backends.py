@@ -0,0 +1,415 @@
+import os
+import copy
+import contextlib
+import concurrent.futures
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np  # engine for numerical computing
+
+# only for large data (e.g., rotation matrix) involved in fitness evaluations
+from pypoplib.continuous_functions import BoundFunction
+from pypoplib.mmes import MMES as LMCMA  # a latest variant of Limited-Memory Covariance Matrix Adaptation
+
+
+# to close *multi-thread* of all numerical libraries for avoiding possible conflicts
+_SINGLE_THREAD_ENV_VARS = {'OPENBLAS_NUM_THREADS': '1',
+                           'MKL_NUM_THREADS': '1',
+                           'OMP_NUM_THREADS': '1',
+                           'NUMEXPR_NUM_THREADS': '1'}
+
+
+@contextlib.contextmanager
+def _updated_environ(env_vars):
+    """Update the environment variables of the current (driver) process by `env_vars` (`dict`), e.g., to be read
+        by all worker processes spawned in this context, and then restore all of them when exiting."""
+    environ = {k: os.environ.get(k) for k in env_vars}
+    os.environ.update(env_vars)
+    try:
+        yield
+    finally:
+        for k, v in environ.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+# (rough) baseline memory (bytes) of one worker process with Python, NumPy, and SciPy loaded
+_PROCESS_MEMORY = 2**28
+
+
+def _estimate_memory(ndim_problem, m, n_individuals=None):
+    """Estimate the (peak) memory footprint (bytes) of one inner ES with `m` candidate direction vectors.
+
+        It counts three copies of `q` (i.e., given, evolved, and returned), all the offspring population and its
+        temporary arrays during sampling and (vectorized) evaluations, and the baseline of one worker process.
+        However, the (shared) rotation matrix is not included, which is stored only once for each node.
+    """
+    if n_individuals is None:  # the same default as `ES`
+        n_individuals = 4 + int(3*np.log(ndim_problem))
+    n_floats = 3*m*ndim_problem + 6*n_individuals*ndim_problem + 16*ndim_problem
+    return _PROCESS_MEMORY + 8*n_floats
+
+
+class InnerES(object):
+    """Long-lived worker to run one inner ES per cycle.
+
+        The problem, the (bound) fitness function, and all cycle-invariant options are sent only once when
+        created, so that each cycle only needs one lightweight *restart* message of (mean, p, w, q, sigma, m,
+        seed_rng), while all loaded problem data and warm caches persist in the same worker across cycles.
+
+        If `shared_q` (specification of one shared buffer of `q` on its node, see `_SharedQ`) is given, the evolved
+        `q` of the `i`-th inner ES is written to its rows in place rather than returned, and the given `q` is read
+        from its rows in place when it is not sent (i.e., `None`), since it has been written there by the driver.
+    """
+    def __init__(self, problem, fitness_function, options, shared_q=None):
+        self.problem = problem
+        self.fitness_function = fitness_function
+        self.options = options  # cycle-invariant options
+        self._memory, self._q = None, None
+        if shared_q is not None:
+            try:
+                self._memory, self._q = _attach_shared_array(shared_q, False)
+            except FileNotFoundError:  # e.g., when it replaces one dead actor on another node
+                pass  # to return `q` as before
+
+    def optimize(self, options, i=None):  # to restart with the given (cycle-variant) options
+        options = dict(self.options, **options)
+        if options.get('q') is None:  # which is copied inside the inner ES
+            options['q'] = self._q[i, -options['m']:]
+        results = LMCMA(self.problem, options).optimize(self.fitness_function)
+        if (i is not None) and (self._q is not None):
+            self._q[i, -results['m']:], results['q'] = results['q'], None
+        return results
+
+
+class _SharedQ(object):
+    """Owner of one shared buffer of `q` of all inner ESs (indexed by slots) on one node, where only rows written
+        by inner ESs on this node take physical memory (since all pages of shared memory are allocated lazily)."""
+    def __init__(self, shape):
+        self._memory, self._q, self._specification = _create_shared_array(shape)
+
+    def get_specification(self):
+        return self._specification
+
+    def read(self, slots, ms):
+        return [self._q[i, -m:] for i, m in zip(slots, ms)]
+
+    def shutdown(self):
+        self._q = None
+        self._memory.close()
+        self._memory.unlink()
+
+
+class Backend(object):
+    """Base (abstract) class of all execution backends for the fan-out of inner ESs.
+
+        Each backend runs `n_inner_es` inner ESs (indexed by slots) in parallel, each of which is submitted with
+        its (cycle-variant) options and returns its results as one `dict`. All handles returned by `submit` are
+        opaque to the caller.
+    """
+    def start(self, problem, fitness_function, options, n_inner_es, m_max):
+        """Start all workers and wait until they are ready (so that their startup time is not counted in the
+            first cycle), where `fitness_function` is the (resolved) fitness function of the optimizer, `options`
+            are cycle-invariant options of all inner ESs, and `m_max` is the maximal number of candidate direction
+            vectors (`q`) of each inner ES."""
+        raise NotImplementedError
+
+    def submit(self, i, options):
+        """Submit the `i`-th inner ES with its (cycle-variant) `options` and return one handle."""
+        raise NotImplementedError
+
+    def wait(self, handles):
+        """Wait until *any* of `handles` is finished and return it."""
+        raise NotImplementedError
+
+    def get(self, handles):
+        """Get the results of one handle (or of a list of handles, in the same order), which raises the error of
+            any failed inner ES (e.g., when its worker unexpectedly exits)."""
+        raise NotImplementedError
+
+    def read_q(self, slots, ms):
+        """Read the `q` (i.e., the last `ms` rows) of all inner ESs in `slots`, which are held by the backend
+            (i.e., `None` in their results), where `None` is returned for each lost one (e.g., with its node)."""
+        raise NotImplementedError
+
+    def recover(self, i):
+        """Recover the worker of the `i`-th inner ES after its failure, so that it can be resubmitted."""
+        pass
+
+    def capacity(self):
+        """Return the number of inner ESs which can run at the same time (`None` if all of them)."""
+        return None
+
+    def shutdown(self):
+        raise NotImplementedError
+
+
+class RayBackend(Backend):
+    """Run each inner ES in one long-lived ray actor on the (already available) ray clustering platform.
+
+        Each actor declares its estimated memory footprint as the ray `memory` resource, and the number of actors
+        on each node is bounded by both its CPU cores and its memory budget, i.e., the given `memory_budget` (bytes,
+        including the shared rotation matrix) or (if `None`) its ray `memory` resource. When all nodes cannot hold
+        `n_inner_es` actors at the same time, inner ESs share actors and run one after another on each of them
+        (rather than being killed by the OOM killer), so that ray's OOM prevention can be kept on.
+
+        The evolved `q` of all inner ESs are not returned to the driver but are written in place to one shared
+        buffer on each node (see `_SharedQ`), from which the driver fetches only the rows it needs (i.e., of elites)
+        via `read_q`. The given `q` of each inner ES on the node of the driver is also written in place to (the
+        attached) shared buffer of this node rather than sent. However, the given `q` of each inner ES on any
+        other node is still sent along with its options, since it has to be sent over network anyway.
+    """
+    def __init__(self, address='auto', memory_budget=None):
+        import ray  # engine for distributed computing (only needed for this backend)
+        self._ray = ray
+        self.address = address
+        self.memory_budget = memory_budget  # memory budget (bytes) of all inner ESs on each node
+        self._actors, self._node_ids = None, None  # all actors and their nodes
+        self._new_actor = None  # to create one new actor on one node (e.g., to replace one dead actor)
+        self._submitted = {}  # actor of the running task of each inner ES
+        self._stores = {}  # owner of the shared buffer of `q` on each node
+        self._driver_node_id, self._memory, self._q = None, None, None  # shared buffer of `q` on the driver node
+
+    def _place(self, memory, shared_memory):
+        """Return IDs of nodes where all actors are placed (one ID per actor), given `memory` of each actor and
+            `shared_memory` of each node."""
+        node_ids = []
+        for node in self._ray.nodes():
+            if not node['Alive']:
+                continue
+            budget = node['Resources'].get('memory', 0)
+            if self.memory_budget is not None:
+                budget = min(budget, self.memory_budget - shared_memory)
+            n_actors = min(int(node['Resources'].get('CPU', 0)), int(budget // memory))
+            node_ids.extend([node['NodeID']]*n_actors)
+        assert len(node_ids) > 0, f'no node can hold one inner ES with {memory} bytes memory.'
+        return node_ids
+
+    def start(self, problem, fitness_function, options, n_inner_es, m_max):
+        ray = self._ray
+        from ray.util.scheduling_strategies import NodeAffinitySchedulingStrategy
+        # https://docs.ray.io/en/latest/ray-core/scheduling/ray-oom-prevention.html
+        ray.init(address=self.address,  # to assume the ray clustering computing platform is available
+            runtime_env={'py_modules': ['./pypoplib'],  # this local folder is shared across all nodes
+                'env_vars': _SINGLE_THREAD_ENV_VARS})
+        ray_problem = ray.put(problem)  # to be shared across all nodes
+        fitness_function = BoundFunction(fitness_function, problem['ndim_problem'])
+        # to avoid repeated coping and communication of the same data over network,
+        #   use *ray.put* to upload them to the shared memory in each node only once
+        #   (bound once with its shift vector and rotation matrix to avoid repeated loading and checking)
+        ray_function = ray.put(fitness_function)
+        # to declare the memory footprint of the largest inner ES (since each actor is reused for all cycles)
+        memory = _estimate_memory(problem['ndim_problem'], m_max)
+        ray_opt = ray.remote(num_cpus=1, memory=memory)(InnerES)  # to be shared across all nodes
+        self._node_ids = self._place(memory, getattr(fitness_function.rotation_matrix, 'nbytes', 0))[:n_inner_es]
+        ray_store = ray.remote(num_cpus=0)(_SharedQ)
+        for node_id in dict.fromkeys(self._node_ids):  # to create one shared buffer of `q` on each node
+            strategy = NodeAffinitySchedulingStrategy(node_id, soft=False)
+            self._stores[node_id] = ray_store.options(scheduling_strategy=strategy).remote(
+                (n_inner_es, m_max, problem['ndim_problem']))
+        shared_qs = dict(zip(self._stores, ray.get([s.get_specification.remote() for s in self._stores.values()])))
+        self._driver_node_id = ray.get_runtime_context().get_node_id()
+        if self._driver_node_id in shared_qs:  # to write the given `q` of its inner ESs in place
+            self._memory, self._q = _attach_shared_array(shared_qs[self._driver_node_id], False)
+
+        def new_actor(node_id, soft=True):  # soft only for replacements (e.g., when its node is dead)
+            # but not for the node of the driver (which is alive), since the given `q` is written in place there
+            strategy = NodeAffinitySchedulingStrategy(node_id, soft=soft and node_id != self._driver_node_id)
+            return ray_opt.options(scheduling_strategy=strategy).remote(ray_problem, ray_function, options,
+                                                                       shared_qs[node_id])
+        self._new_actor = new_actor
+        # to create one pool of long-lived inner ESs (at most one per CPU slot) only once for all cycles
+        self._actors = [new_actor(node_id, False) for node_id in self._node_ids]
+        ray.get([a.__ray_ready__.remote() for a in self._actors])
+
+    def submit(self, i, options):  # the `i`-th inner ES runs on one (possibly shared) actor
+        self._submitted[i] = self._actors[i % len(self._actors)]
+        if self._node_ids[i % len(self._actors)] == self._driver_node_id:  # not to send the given `q`
+            options = dict(options)
+            self._q[i, -options['m']:], options['q'] = options['q'], None
+        return self._submitted[i].optimize.remote(options, i)
+
+    def wait(self, handles):
+        ready, _ = self._ray.wait(list(handles), num_returns=1)
+        return ready[0]
+
+    def get(self, handles):
+        return self._ray.get(handles)
+
+    def read_q(self, slots, ms):  # with one request to the shared buffer on each node
+        requests = {}
+        for i, m in zip(slots, ms):
+            requests.setdefault(self._node_ids[i % len(self._actors)], []).append((i, m))
+        handles = {node_id: self._stores[node_id].read.remote(*zip(*r)) for node_id, r in requests.items()}
+        q = {}
+        for node_id, r in requests.items():
+            try:
+                q.update(zip([i for i, _ in r], self._ray.get(handles[node_id])))
+            except Exception:  # e.g., when its node is dead
+                q.update((i, None) for i, _ in r)
+        return [q[i] for i in slots]
+
+    def recover(self, i):  # to replace its (possibly dead) actor by one new actor (if possible, on the same node)
+        j = i % len(self._actors)
+        if self._actors[j] is self._submitted.pop(i, None):  # not yet replaced (by another inner ES sharing it)
+            self._ray.kill(self._actors[j], no_restart=True)
+            self._actors[j] = self._new_actor(self._node_ids[j])
+
+    def capacity(self):
+        return len(self._actors)
+
+    def shutdown(self):
+        try:  # to release all shared buffers of `q` (otherwise, only when their owners exit)
+            self._ray.get([s.shutdown.remote() for s in self._stores.values()])
+        except Exception:  # e.g., when one node is dead
+            pass
+        if self._memory is not None:
+            self._q = None
+            self._memory.close()
+        self._ray.shutdown()  # to clear the current ray environment
+        self._actors, self._node_ids, self._new_actor, self._submitted, self._stores = None, None, None, {}, {}
+        self._driver_node_id, self._memory = None, None
+
+
+def _create_shared_array(shape, dtype=np.float64):
+    """Create one array in (new) shared memory and return both, where the returned specification
+        `(name, shape, dtype)` can be sent to other processes on the same node to attach it."""
+    dtype = np.dtype(dtype)
+    memory = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape))*dtype.itemsize))
+    return memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf), (memory.name, shape, dtype)
+
+
+def _attach_shared_array(specification, is_tracked=True):
+    """Attach (zero-copy) one array created by `_create_shared_array` via its specification.
+        If not `is_tracked` (e.g., for one process not started by `multiprocessing`), it is not unlinked by the
+        resource tracker of this process when this process exits (e.g., when killed)."""
+    name, shape, dtype = specification
+    memory = shared_memory.SharedMemory(name=name)
+    if not is_tracked:
+        resource_tracker.unregister(memory._name, 'shared_memory')
+    return memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+# global state of each worker process of `LocalBackend` (set only once by its initializer)
+_local_inner_es, _local_q, _local_shared_memories, _local_barrier = None, None, [], None
+
+
+def _initialize_local_worker(problem, fitness_function, options, shift_vector, rotation_matrix,
+                             shared_rotation_matrix, shared_q, barrier):
+    global _local_inner_es, _local_q, _local_barrier
+    _local_barrier = barrier
+    if shared_rotation_matrix is not None:  # to attach (zero-copy) the rotation matrix in shared memory
+        memory, rotation_matrix = _attach_shared_array(shared_rotation_matrix)
+        _local_shared_memories.append(memory)
+    memory, _local_q = _attach_shared_array(shared_q)
+    _local_shared_memories.append(memory)
+    fitness_function = BoundFunction(fitness_function, problem['ndim_problem'], shift_vector, rotation_matrix)
+    _local_inner_es = InnerES(problem, fitness_function, options)
+
+
+def _wait_local_workers():
+    # to block until all worker processes are started (so that each of them runs exactly one such task)
+    _local_barrier.wait()
+
+
+def _optimize_local_inner_es(i, options):
+    # to read and write the `q` of the `i`-th inner ES in place in shared memory (rather than via pickle)
+    options['q'] = _local_q[i, -options['m']:]  # which is copied inside the inner ES
+    results = _local_inner_es.optimize(options)
+    _local_q[i, -options['m']:], results['q'] = results['q'], None
+    return results
+
+
+class LocalBackend(Backend):
+    """Run all inner ESs on one pool of (`n_workers`) local processes via `concurrent.futures.ProcessPoolExecutor`.
+
+        The (dense) rotation matrix is shared by all worker processes through `multiprocessing.shared_memory`
+        (only one copy per node), and each worker process is pinned to one BLAS thread. No ray clustering
+        platform is needed, which is suitable for single nodes and for continuous integration.
+
+        The (largest) state of all inner ESs, i.e., their candidate direction vectors `q`, is also held in one
+        preallocated shared buffer of shape (`n_inner_es`, `m_max`, `ndim_problem`): the driver writes the rows of
+        each inner ES in place before submitting it, the inner ES reads and then overwrites them in place, and
+        only indexes and (relatively small) others are pickled between processes. Since each slot is touched
+        either only by the driver (when not running) or only by its inner ES (when running), no lock is needed.
+    """
+    def __init__(self, n_workers=None, memory_budget=None):
+        self.n_workers = n_workers  # number of worker processes (if `None`, one per CPU core)
+        self.memory_budget = memory_budget  # memory budget (bytes) of all inner ESs (if `None`, no bound)
+        self._executor, self._shared_memories = None, []
+        self._environ = contextlib.ExitStack()  # to restore all environment variables of the driver at shutdown
+        self._q, self._slots = None, {}  # shared buffer of `q` and slot of each running handle
+        self._new_executor = None  # to create one new pool of worker processes (e.g., to replace one broken pool)
+        self._n_workers = None  # actual number of worker processes (bounded by the memory budget)
+
+    def start(self, problem, fitness_function, options, n_inner_es, m_max):
+        n_workers = self.n_workers or min(n_inner_es, os.cpu_count())
+        bound_function = BoundFunction(fitness_function, problem['ndim_problem'])
+        shift_vector, rotation_matrix = bound_function.shift_vector, bound_function.rotation_matrix
+        shared_rotation_matrix = None
+        if isinstance(rotation_matrix, np.ndarray):  # structured rotations are light enough to be copied
+            memory, shared, shared_rotation_matrix = _create_shared_array(rotation_matrix.shape, rotation_matrix.dtype)
+            shared[:] = rotation_matrix
+            self._shared_memories.append(memory)
+            rotation_matrix = None
+        memory, self._q, shared_q = _create_shared_array((n_inner_es, m_max, problem['ndim_problem']))
+        self._shared_memories.append(memory)
+        if self.memory_budget is not None:  # to bound the number of worker processes by the memory budget
+            budget = self.memory_budget - sum(memory.size for memory in self._shared_memories)
+            n_workers = min(n_workers, int(budget // _estimate_memory(problem['ndim_problem'], m_max)))
+            assert n_workers > 0, f'the memory budget {self.memory_budget} cannot hold one inner ES.'
+        self._n_workers = n_workers
+        # to pin BLAS threads of all (spawned) worker processes, which read these environment variables at start
+        self._environ.enter_context(_updated_environ(_SINGLE_THREAD_ENV_VARS))
+        context = multiprocessing.get_context('spawn')
+        barrier = context.Barrier(n_workers)
+        self._new_executor = lambda: concurrent.futures.ProcessPoolExecutor(
+            max_workers=n_workers, mp_context=context, initializer=_initialize_local_worker,
+            initargs=(problem, fitness_function, options, np.asarray(shift_vector), rotation_matrix,
+                      shared_rotation_matrix, shared_q, barrier))
+        self._executor = self._new_executor()
+        # to start all worker processes at once, since they are started only on demand (one per task submitted
+        #   while none of them is idle)
+        for handle in [self._executor.submit(_wait_local_workers) for _ in range(n_workers)]:
+            handle.result()
+
+    def submit(self, i, options):
+        options = dict(options)
+        self._q[i, -options['m']:], options['q'] = options['q'], None
+        # to copy eagerly since all arguments are pickled *lazily* (when one worker process is available),
+        #   while the driver may have modified the (viewed) arrays in place in the meantime
+        options = copy.deepcopy(options)
+        try:
+            handle = self._executor.submit(_optimize_local_inner_es, i, options)
+        except concurrent.futures.BrokenExecutor:  # when any worker process unexpectedly exited
+            self._executor.shutdown(wait=False)  # all its running tasks have failed (and are to be recovered)
+            self._executor = self._new_executor()
+            handle = self._executor.submit(_optimize_local_inner_es, i, options)
+        self._slots[handle] = i
+        return handle
+
+    def wait(self, handles):
+        done, _ = concurrent.futures.wait(list(handles), return_when=concurrent.futures.FIRST_COMPLETED)
+        return next(iter(done))
+
+    def get(self, handles):
+        if not isinstance(handles, concurrent.futures.Future):
+            return [self.get(h) for h in handles]
+        i = self._slots.pop(handles)
+        results = handles.result()  # which raises the error of one failed inner ES
+        results['q'] = self._q[i, -results['m']:]  # to read in place (the slot is not touched until resubmitted)
+        return results
+
+    def capacity(self):
+        return self._n_workers
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        self._q, self._slots = None, {}
+        for memory in self._shared_memories:
+            memory.close()
+            memory.unlink()
+        self._environ.close()  # to restore all environment variables of the driver
+        self._executor, self._shared_memories, self._new_executor = None, [], None
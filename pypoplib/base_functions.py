@@ -1,3 +1,5 @@
+import functools
+
 import numpy as np
 
 
@@ -19,62 +21,188 @@ def _squeeze_and_check(x, size_gt_1=False):
     return x
 
 
+@functools.lru_cache(maxsize=None)
+def _ellipsoid_weights(ndim):
+    """Cached (read-only) weights of `ellipsoid` for each dimension `ndim`."""
+    w = np.power(10, 6 * np.linspace(0, 1, ndim))
+    w.flags.writeable = False
+    return w
+
+
+@functools.lru_cache(maxsize=None)
+def _different_powers_exponents(ndim):
+    """Cached (read-only) exponents of `different_powers` for each dimension `ndim`."""
+    e = 2 + 4 * np.linspace(0, 1, ndim)
+    e.flags.writeable = False
+    return e
+
+
+def _squeeze_and_check_population(x, size_gt_1=False):
+    """Check the input population `x` as a 2-d `numpy.ndarray`, whose each row is one decision vector.
+        A 1-d input is regarded as a population of only one row. If its number of dimensions != 2 (after
+        this promotion), raise a TypeError.
+        Optionally, check whether its number of columns > 1. If not, raise a TypeError.
+    """
+    x = np.asarray(x)
+    if x.ndim == 1:
+        x = x[np.newaxis]
+    if x.ndim != 2:
+        raise TypeError(f'The number of dimensions of the population should == 2 (not {x.ndim}).')
+    if size_gt_1 and not (x.shape[1] > 1):
+        raise TypeError(f'The number of columns should > 1 (not {x.shape[1]}).')
+    if x.size == 0:
+        raise TypeError('the size should != 0.')
+    return x
+
+
+def _sum_of_squares(x):
+    """Sum of squares along the last axis (i.e., one for a 1-d `x` and one per row for a 2-d `x`)."""
+    if x.ndim == 1:
+        return np.dot(x, x)
+    return np.einsum('ij,ij->i', x, x)
+
+
+# unchecked kernels shared by the scalar and batched versions (along the last axis of a 1-d or 2-d `ndarray`),
+#   which are also used directly by `pypoplib.continuous_functions.BoundFunction` after checking only once
+def _sphere(x):
+    return _sum_of_squares(x)
+
+
+def _cigar(x):
+    return np.square(x[..., 0]) + (10 ** 6) * _sum_of_squares(x[..., 1:])
+
+
+def _discus(x):
+    return (10 ** 6) * np.square(x[..., 0]) + _sum_of_squares(x[..., 1:])
+
+
+def _cigar_discus(x):
+    if x.shape[-1] == 2:
+        return np.square(x[..., 0]) + (10 ** 4) * _sum_of_squares(x) + (10 ** 6) * np.square(x[..., -1])
+    return np.square(x[..., 0]) + (10 ** 4) * _sum_of_squares(x[..., 1:-1]) + (10 ** 6) * np.square(x[..., -1])
+
+
+def _ellipsoid(x):
+    return np.dot(np.square(x), _ellipsoid_weights(x.shape[-1]))
+
+
+def _different_powers(x):
+    return np.sum(np.power(np.abs(x), _different_powers_exponents(x.shape[-1])), axis=-1)
+
+
+def _schwefel221(x):
+    return np.max(np.abs(x), axis=-1)
+
+
+def _step(x):
+    return _sum_of_squares(np.floor(x + 0.5))
+
+
+def _rosenbrock(x):
+    x_1, x_2 = x[..., 1:] - np.square(x[..., :-1]), x[..., :-1] - 1
+    return 100 * _sum_of_squares(x_1) + _sum_of_squares(x_2)
+
+
+def _schwefel12(x):
+    return _sum_of_squares(np.cumsum(x, axis=-1))  # all partial sums in O(n) rather than O(n^2)
+
+
 def sphere(x):
-    y = np.sum(np.power(_squeeze_and_check(x), 2))
+    y = _sphere(_squeeze_and_check(x))
     return y
 
 
 def cigar(x):
-    x = np.power(_squeeze_and_check(x, True), 2)
-    y = x[0] + (10 ** 6) * np.sum(x[1:])
+    y = _cigar(_squeeze_and_check(x, True))
     return y
 
 
 def discus(x):  # also called tablet
-    x = np.power(_squeeze_and_check(x, True), 2)
-    y = (10 ** 6) * x[0] + np.sum(x[1:])
+    y = _discus(_squeeze_and_check(x, True))
     return y
 
 
 def cigar_discus(x):
-    x = np.power(_squeeze_and_check(x, True), 2)
-    if x.size == 2:
-        y = x[0] + (10 ** 4) * np.sum(x) + (10 ** 6) * x[-1]
-    else:
-        y = x[0] + (10 ** 4) * np.sum(x[1:-1]) + (10 ** 6) * x[-1]
+    y = _cigar_discus(_squeeze_and_check(x, True))
     return y
 
 
 def ellipsoid(x):
-    x = np.power(_squeeze_and_check(x, True), 2)
-    y = np.dot(np.power(10, 6 * np.linspace(0, 1, x.size)), x)
+    y = _ellipsoid(_squeeze_and_check(x, True))
     return y
 
 
 def different_powers(x):
-    x = np.abs(_squeeze_and_check(x, True))
-    y = np.sum(np.power(x, 2 + 4 * np.linspace(0, 1, x.size)))
+    y = _different_powers(_squeeze_and_check(x, True))
     return y
 
 
 def schwefel221(x):
-    y = np.max(np.abs(_squeeze_and_check(x)))
+    y = _schwefel221(_squeeze_and_check(x))
     return y
 
 
 def step(x):
-    y = np.sum(np.power(np.floor(_squeeze_and_check(x) + 0.5), 2))
+    y = _step(_squeeze_and_check(x))
     return y
 
 
 def rosenbrock(x):
-    x = _squeeze_and_check(x, True)
-    y = 100 * np.sum(np.power(x[1:] - np.power(x[:-1], 2), 2)) + np.sum(np.power(x[:-1] - 1, 2))
+    y = _rosenbrock(_squeeze_and_check(x, True))
     return y
 
 
 def schwefel12(x):
-    x = _squeeze_and_check(x, True)
-    x = [np.sum(x[:i + 1]) for i in range(x.size)]
-    y = np.sum(np.power(x, 2))
+    y = _schwefel12(_squeeze_and_check(x, True))
+    return y
+
+
+# batched versions (one fitness per row of a population)
+def sphere_batch(x):
+    y = _sphere(_squeeze_and_check_population(x))
+    return y
+
+
+def cigar_batch(x):
+    y = _cigar(_squeeze_and_check_population(x, True))
+    return y
+
+
+def discus_batch(x):  # also called tablet
+    y = _discus(_squeeze_and_check_population(x, True))
+    return y
+
+
+def cigar_discus_batch(x):
+    y = _cigar_discus(_squeeze_and_check_population(x, True))
+    return y
+
+
+def ellipsoid_batch(x):
+    y = _ellipsoid(_squeeze_and_check_population(x, True))
+    return y
+
+
+def different_powers_batch(x):
+    y = _different_powers(_squeeze_and_check_population(x, True))
+    return y
+
+
+def schwefel221_batch(x):
+    y = _schwefel221(_squeeze_and_check_population(x))
+    return y
+
+
+def step_batch(x):
+    y = _step(_squeeze_and_check_population(x))
+    return y
+
+
+def rosenbrock_batch(x):
+    y = _rosenbrock(_squeeze_and_check_population(x, True))
+    return y
+
+
+def schwefel12_batch(x):
+    y = _schwefel12(_squeeze_and_check_population(x, True))
     return y
@@ -1,8 +1,10 @@
 import numpy as np
 
 import pypoplib.base_functions as base_functions
-from pypoplib.shifted_functions import _load_shift_vector
+from pypoplib.base_functions import _squeeze_and_check_population
+from pypoplib.shifted_functions import _load_shift_vector, convert_txt_to_npy
 from pypoplib.rotated_functions import _load_rotation_matrix
+from pypoplib.structured_rotations import StructuredRotation, rotate
 
 
 # helper functions
@@ -12,71 +14,191 @@ def load_shift_and_rotation(func, x, shift_vector=None, rotation_matrix=None):
     return shift_vector, rotation_matrix
 
 
+def shift_and_rotate_population(func, x, shift_vector=None, rotation_matrix=None):
+    """Shift and then rotate all rows of the population `x` via only one matrix-matrix product.
+
+    :param func: function name, a `function` object (whose shift vector and rotation matrix are shared).
+    :param x: population, a 2-d array_like of floats whose each row is one decision vector.
+    :param shift_vector: shift vector, array_like of floats.
+    :param rotation_matrix: rotation matrix, array_like of floats.
+    :return: shifted and rotated population, a 2-d `ndarray` with the same shape as `x`.
+    """
+    x = _squeeze_and_check_population(x)
+    shift_vector, rotation_matrix = load_shift_and_rotation(func, x[0], shift_vector, rotation_matrix)
+    return rotate(rotation_matrix, x - shift_vector)
+
+
 def sphere(x, shift_vector=None, rotation_matrix=None):
     shift_vector, rotation_matrix = load_shift_and_rotation(sphere, x, shift_vector, rotation_matrix)
-    x = np.dot(rotation_matrix, x - shift_vector)
+    x = rotate(rotation_matrix, x - shift_vector)
     y = base_functions.sphere(x)
     return y
 
 
 def cigar(x, shift_vector=None, rotation_matrix=None):
     shift_vector, rotation_matrix = load_shift_and_rotation(cigar, x, shift_vector, rotation_matrix)
-    x = np.dot(rotation_matrix, x - shift_vector)
+    x = rotate(rotation_matrix, x - shift_vector)
     y = base_functions.cigar(x)
     return y
 
 
 def discus(x, shift_vector=None, rotation_matrix=None):
     shift_vector, rotation_matrix = load_shift_and_rotation(discus, x, shift_vector, rotation_matrix)
-    x = np.dot(rotation_matrix, x - shift_vector)
+    x = rotate(rotation_matrix, x - shift_vector)
     y = base_functions.discus(x)
     return y
 
 
 def cigar_discus(x, shift_vector=None, rotation_matrix=None):
     shift_vector, rotation_matrix = load_shift_and_rotation(cigar_discus, x, shift_vector, rotation_matrix)
-    x = np.dot(rotation_matrix, x - shift_vector)
+    x = rotate(rotation_matrix, x - shift_vector)
     y = base_functions.cigar_discus(x)
     return y
 
 
 def ellipsoid(x, shift_vector=None, rotation_matrix=None):
     shift_vector, rotation_matrix = load_shift_and_rotation(ellipsoid, x, shift_vector, rotation_matrix)
-    x = np.dot(rotation_matrix, x - shift_vector)
+    x = rotate(rotation_matrix, x - shift_vector)
     y = base_functions.ellipsoid(x)
     return y
 
 
 def different_powers(x, shift_vector=None, rotation_matrix=None):
     shift_vector, rotation_matrix = load_shift_and_rotation(different_powers, x, shift_vector, rotation_matrix)
-    x = np.dot(rotation_matrix, x - shift_vector)
+    x = rotate(rotation_matrix, x - shift_vector)
     y = base_functions.different_powers(x)
     return y
 
 
 def schwefel221(x, shift_vector=None, rotation_matrix=None):
     shift_vector, rotation_matrix = load_shift_and_rotation(schwefel221, x, shift_vector, rotation_matrix)
-    x = np.dot(rotation_matrix, x - shift_vector)
+    x = rotate(rotation_matrix, x - shift_vector)
     y = base_functions.schwefel221(x)
     return y
 
 
 def step(x, shift_vector=None, rotation_matrix=None):
     shift_vector, rotation_matrix = load_shift_and_rotation(step, x, shift_vector, rotation_matrix)
-    x = np.dot(rotation_matrix, x - shift_vector)
+    x = rotate(rotation_matrix, x - shift_vector)
     y = base_functions.step(x)
     return y
 
 
 def rosenbrock(x, shift_vector=None, rotation_matrix=None):
     shift_vector, rotation_matrix = load_shift_and_rotation(rosenbrock, x, shift_vector, rotation_matrix)
-    x = np.dot(rotation_matrix, x - shift_vector)
+    x = rotate(rotation_matrix, x - shift_vector)
     y = base_functions.rosenbrock(x)
     return y
 
 
 def schwefel12(x, shift_vector=None, rotation_matrix=None):
     shift_vector, rotation_matrix = load_shift_and_rotation(schwefel12, x, shift_vector, rotation_matrix)
-    x = np.dot(rotation_matrix, x - shift_vector)
+    x = rotate(rotation_matrix, x - shift_vector)
     y = base_functions.schwefel12(x)
     return y
+
+
+# batched versions: each takes a population of shape (n, d) and returns n fitness values
+def sphere_batch(x, shift_vector=None, rotation_matrix=None):
+    x = shift_and_rotate_population(sphere, x, shift_vector, rotation_matrix)
+    y = base_functions.sphere_batch(x)
+    return y
+
+
+def cigar_batch(x, shift_vector=None, rotation_matrix=None):
+    x = shift_and_rotate_population(cigar, x, shift_vector, rotation_matrix)
+    y = base_functions.cigar_batch(x)
+    return y
+
+
+def discus_batch(x, shift_vector=None, rotation_matrix=None):
+    x = shift_and_rotate_population(discus, x, shift_vector, rotation_matrix)
+    y = base_functions.discus_batch(x)
+    return y
+
+
+def cigar_discus_batch(x, shift_vector=None, rotation_matrix=None):
+    x = shift_and_rotate_population(cigar_discus, x, shift_vector, rotation_matrix)
+    y = base_functions.cigar_discus_batch(x)
+    return y
+
+
+def ellipsoid_batch(x, shift_vector=None, rotation_matrix=None):
+    x = shift_and_rotate_population(ellipsoid, x, shift_vector, rotation_matrix)
+    y = base_functions.ellipsoid_batch(x)
+    return y
+
+
+def different_powers_batch(x, shift_vector=None, rotation_matrix=None):
+    x = shift_and_rotate_population(different_powers, x, shift_vector, rotation_matrix)
+    y = base_functions.different_powers_batch(x)
+    return y
+
+
+def schwefel221_batch(x, shift_vector=None, rotation_matrix=None):
+    x = shift_and_rotate_population(schwefel221, x, shift_vector, rotation_matrix)
+    y = base_functions.schwefel221_batch(x)
+    return y
+
+
+def step_batch(x, shift_vector=None, rotation_matrix=None):
+    x = shift_and_rotate_population(step, x, shift_vector, rotation_matrix)
+    y = base_functions.step_batch(x)
+    return y
+
+
+def rosenbrock_batch(x, shift_vector=None, rotation_matrix=None):
+    x = shift_and_rotate_population(rosenbrock, x, shift_vector, rotation_matrix)
+    y = base_functions.rosenbrock_batch(x)
+    return y
+
+
+def schwefel12_batch(x, shift_vector=None, rotation_matrix=None):
+    x = shift_and_rotate_population(schwefel12, x, shift_vector, rotation_matrix)
+    y = base_functions.schwefel12_batch(x)
+    return y
+
+
+class BoundFunction(object):
+    """Rotated-shifted function *bound* to its dimension, shift vector, and rotation matrix.
+
+        All (relatively costly) loading and checking are done only once at construction, so that each call
+        (e.g., inside hot loops of optimizers) conducts only the arithmetic of fitness evaluation. Note that
+        the input `x` is *not* checked at all when called.
+
+        For example, to use it directly as the fitness function of any optimizer:
+          `problem['fitness_function'] = BoundFunction(sphere, ndim_problem)`.
+
+    :param func: function name, a `function` object defined in this module (e.g., `sphere`).
+    :param ndim_problem: number of dimensionality, an `int` scalar.
+    :param shift_vector: shift vector, array_like of floats (if `None`, loaded as `func` does).
+    :param rotation_matrix: rotation matrix, array_like of floats or a `StructuredRotation` object (if `None`,
+                            loaded as `func` does).
+    """
+    def __init__(self, func, ndim_problem, shift_vector=None, rotation_matrix=None):
+        if not hasattr(base_functions, '_' + func.__name__):
+            raise TypeError(f'{func.__name__} has no base function to be bound.')
+        self.function = func
+        self.__name__ = func.__name__  # same name as the unbound function (e.g., for saving results)
+        self.ndim_problem = ndim_problem
+        self.shift_vector, self.rotation_matrix = load_shift_and_rotation(
+            func, np.empty((ndim_problem,)), shift_vector, rotation_matrix)
+        func(np.zeros((ndim_problem,)), self.shift_vector, self.rotation_matrix)  # to check all remaining settings
+        self._base_function = getattr(base_functions, '_' + func.__name__)
+        if isinstance(self.rotation_matrix, StructuredRotation):
+            self._rotate, self._rotate_batch = self.rotation_matrix.rotate, self.rotation_matrix.rotate
+        else:
+            rotation_matrix_t = self.rotation_matrix.T
+            self._rotate = lambda x: np.dot(self.rotation_matrix, x)
+            self._rotate_batch = lambda x: np.dot(x, rotation_matrix_t)
+
+    def __call__(self, x):
+        """Evaluate one decision vector `x` (a 1-d `ndarray` of size `ndim_problem`)."""
+        return self._base_function(self._rotate(x - self.shift_vector))
+
+    def batch(self, x):
+        """Evaluate one population `x` (a 2-d `ndarray` of shape (n, `ndim_problem`)) and return n fitness."""
+        return self._base_function(self._rotate_batch(x - self.shift_vector))
+
+    def __reduce__(self):  # lambdas cannot be pickled, so rebuild them from all (already loaded) data
+        return self.__class__, (self.function, self.ndim_problem, self.shift_vector, self.rotation_matrix)
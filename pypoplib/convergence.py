@@ -0,0 +1,118 @@
+import os
+import json
+import argparse
+import hashlib
+import warnings
+
+import numpy as np
+
+from pypoplib.results_store import ResultsStore
+
+
+# version of all cached aggregates (to be increased whenever they change, so that older ones are not reused)
+_CACHE_VERSION = 2
+
+
+def best_so_far(y):
+    """Get the best-so-far (i.e., non-increasing) fitness curve of the given fitness curve."""
+    return np.minimum.accumulate(y, axis=-1)
+
+
+def get_time_grid(t_min=1e-1, t_max=3600*3, n_grid=256):
+    """Get one log-spaced time grid (seconds) shared by all trials."""
+    return np.logspace(np.log10(t_min), np.log10(t_max), n_grid)
+
+
+def interpolate(time, y, grid):
+    """Interpolate one (best-so-far) curve step-wise onto the `grid`, i.e., the last value not later than each
+        grid point (`NaN` before its first point and its last value after its end)."""
+    i = np.searchsorted(time, grid, side='right') - 1
+    return np.where(i >= 0, y[np.maximum(i, 0)], np.nan)
+
+
+def aggregate_trials(curves, runtime, n_function_evaluations, grid, quantiles=(0.25, 0.5, 0.75)):
+    """Aggregate all trials (of one optimizer on one function) onto the shared time `grid`.
+
+    :param curves: convergence curves of all trials, each of which is one `ndarray` of shape (`n`, 2), i.e.,
+                   (number of function evaluations, fitness) for each row.
+    :param runtime: runtime of all trials (`array_like`).
+    :param n_function_evaluations: total number of function evaluations of all trials (`array_like`), used to
+                                   rescale numbers of function evaluations to runtime for each trial.
+    :param grid: shared time grid (`ndarray`).
+    :param quantiles: quantiles across all trials (`tuple`).
+    :return: one `dict` of quantiles (`ndarray` of shape (`len(quantiles)`, `len(grid)`)), and runtime and
+             fitness at the end of all trials (`ndarray` of shape (`len(curves)`,)).
+    """
+    values = np.full((len(curves), len(grid)), np.nan)
+    end_runtime, end_fitness = np.full((len(curves),), np.nan), np.full((len(curves),), np.nan)
+    if len(curves) == 0:  # e.g., for one optimizer without any run stored (with the same shape as others)
+        return {'quantiles': np.full((len(quantiles), len(grid)), np.nan),
+                'end_runtime': end_runtime, 'end_fitness': end_fitness}
+    for k, (curve, r, n) in enumerate(zip(curves, runtime, n_function_evaluations)):
+        if len(curve) == 0:
+            continue
+        time, y = curve[:, 0]*(r/n), best_so_far(curve[:, 1])
+        values[k] = interpolate(time, y, grid)
+        end_runtime[k], end_fitness[k] = time[-1], y[-1]
+    with warnings.catch_warnings():  # for grid points before the first point of all trials
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        bands = np.nanquantile(values, quantiles, axis=0)
+    return {'quantiles': bands, 'end_runtime': end_runtime, 'end_fitness': end_fitness}
+
+
+def aggregate(store, function, optimizers, grid=None, quantiles=(0.25, 0.5, 0.75),
+              scale='n_function_evaluations', cache='.convergence_cache'):
+    """Aggregate convergence curves of all `optimizers` on one `function` from the `store` (`ResultsStore`).
+
+        All aggregates are cached on disk in the `cache` folder (if not `None`), keyed by all arguments and by
+        the `signature` of the store (i.e., modification times and sizes of all its files), so that they are
+        computed only once for the same data.
+
+    :param scale: to rescale numbers of function evaluations to runtime by `'n_function_evaluations'` (the total
+                  number of function evaluations) or by `'last'` (the last number of function evaluations saved).
+    :return: one `dict` of `aggregate_trials` results for each optimizer.
+    """
+    grid = get_time_grid() if grid is None else np.asarray(grid)
+    if cache is not None:
+        key = json.dumps([_CACHE_VERSION, store.signature(), function, list(optimizers), grid.tolist(),
+                          list(quantiles), scale])
+        file = os.path.join(cache, hashlib.sha1(key.encode()).hexdigest() + '.npz')
+        if os.path.exists(file):
+            with np.load(file) as data:
+                return {o: {k: data[o + '__' + k] for k in ['quantiles', 'end_runtime', 'end_fitness']}
+                        for o in optimizers}
+    meta = store.read(function=function, optimizer=list(optimizers))
+    curves, results = store.read_curves(meta), {}
+    for o in optimizers:
+        k = np.nonzero(meta['optimizer'] == o)[0]
+        if scale == 'n_function_evaluations':
+            n = meta['n_function_evaluations'][k]
+        else:
+            n = [curves[i][-1, 0] if len(curves[i]) > 0 else np.nan for i in k]
+        results[o] = aggregate_trials([curves[i] for i in k], meta['runtime'][k], n, grid, quantiles)
+    if cache is not None:
+        if not os.path.exists(cache):
+            os.makedirs(cache)
+        with open(file + '.tmp', 'wb') as handle:  # to save atomically
+            np.savez(handle, **{o + '__' + k: v for o, r in results.items() for k, v in r.items()})
+        os.replace(file + '.tmp', file)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--store', type=str, default='pypop7_benchmarks_lso')  # folder of the results store
+    parser.add_argument('--functions', type=str)  # test functions, separated by commas (default to all stored)
+    parser.add_argument('--optimizers', type=str)  # optimizers, separated by commas (default to all stored)
+    parser.add_argument('--scale', type=str, default='n_function_evaluations')  # or 'last'
+    parser.add_argument('--cache', type=str, default='.convergence_cache')  # folder of all cached aggregates
+    args = parser.parse_args()
+    results_store = ResultsStore(args.store)
+    all_meta = results_store.read(['optimizer', 'function'])
+    functions = args.functions.split(',') if args.functions else list(dict.fromkeys(all_meta['function']))
+    algos = args.optimizers.split(',') if args.optimizers else list(dict.fromkeys(all_meta['optimizer']))
+    for f in functions:  # to (pre)compute all aggregates and print their medians at the end
+        print('* {:s} ***'.format(f))
+        for a, r in aggregate(results_store, f, algos, scale=args.scale, cache=args.cache).items():
+            print('  {:s}: median runtime {:7.5e}, median fitness {:5.2e}'.format(
+                a, np.nanmedian(r['end_runtime']), np.nanmedian(r['end_fitness'])))
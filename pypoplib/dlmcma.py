@@ -1,24 +1,52 @@
+import json
 import time
+import collections
 
 import numpy as np  # engine for numerical computing
-import ray  # engine for distributed computing
 
-# only for large data (e.g., rotation matrix) involved in fitness evaluations
-from pypoplib.continuous_functions import load_shift_and_rotation as load_sr
+from pypoplib.backends import RayBackend, LocalBackend  # engines for distributed (or local) computing
 from pypoplib.es import ES  # abstract class for `ES`
-from pypoplib.mmes import MMES as LMCMA  # a latest variant of Limited-Memory Covariance Matrix Adaptation
 
 
 class DLMCMA(ES):  # in `pypoplib` folder
+    # all phases of the outer loop, where 'sync' (waiting for and getting results of inner ESs) and 'submit' are
+    #   profiled on its backend (and all phases of inner ESs are not profiled)
+    _PHASES = {'generate': ['_generate_options'], 'ingest': ['_ingest'], 'recombine': ['_recombine'],
+               'termination': ['_check_terminations']}
+
     def __init__(self, problem, options):
         ES.__init__(self, problem, options)
         self.n_inner_es = options.get('n_inner_es')  # total number of inner ESs in parallel
-        assert self.n_inner_es is not None and self.n_inner_es >= 40,\
-            'there are at least 40 (logical) CPU cores.'
+        # set execution backend for the fan-out of inner ESs: 'ray' (default), 'local', or any `Backend` object
+        self.backend = options.get('backend', 'ray')
+        # set memory budget (bytes) of all inner ESs on each node, which bounds the number of inner ESs running at
+        #   the same time on it (if `None`, only the `memory` resource of each node is used for the ray backend)
+        self.memory_budget = options.get('memory_budget')
+        if self.backend == 'ray':
+            assert self.n_inner_es is not None and self.n_inner_es >= 40,\
+                'there are at least 40 (logical) CPU cores.'
+        else:
+            assert self.n_inner_es is not None and self.n_inner_es >= 5,\
+                'there are at least 5 inner ESs (i.e., at least one for the outer ES).'
         self.runtime_inner_es = options.get('runtime_inner_es', 2.5*60)  # runtime of each inner ES (seconds) in each cycle
         assert self.runtime_inner_es >= 3  # seconds
-        # to make sure actual runtime does not exceed given 'max_runtime' AMAP
-        self.max_runtime -= self.runtime_inner_es  # this may result in slightly less runtime (unfair for `DES`)
+        # whether or not to adapt the runtime of inner ESs cycle by cycle (only for the synchronous outer loop),
+        #   where `runtime_inner_es` is used only as its initial value
+        self.is_adaptive_runtime = options.get('is_adaptive_runtime', False)
+        self.min_runtime_inner_es = options.get('min_runtime_inner_es', 3)  # minimal runtime of inner ESs (seconds)
+        assert self.min_runtime_inner_es >= 3  # seconds
+        # maximal runtime of inner ESs (seconds)
+        self.max_runtime_inner_es = options.get('max_runtime_inner_es', 4*self.runtime_inner_es)
+        assert self.max_runtime_inner_es >= self.min_runtime_inner_es
+        # decay factor (per cycle) of the target improvement rate of the best-so-far fitness (see `_adapt_runtime`)
+        self.rate_decay = options.get('rate_decay', 0.5)
+        assert 0.0 <= self.rate_decay < 1.0
+        if not self.is_adaptive_runtime:  # otherwise, the last cycle is sized to use all the runtime exactly
+            # to make sure actual runtime does not exceed given 'max_runtime' AMAP
+            self.max_runtime -= self.runtime_inner_es  # this may result in slightly less runtime (unfair for `DES`)
+        self._runtime_inner_es = self.runtime_inner_es  # (adaptive) runtime of inner ESs for the next cycle
+        self._rate = None  # (decaying) target of the (relative) improvement rate of the best-so-far fitness
+        self._cycles = []  # to record timing (and progress) of all cycles
         self.n_outer = int(self.n_inner_es/5)  # number of inner ESs for outer ES (MetaES)
         w_base, w = np.log((self.n_outer*2 + 1.0)/2.0), np.log(np.arange(self.n_outer) + 1.0)
         self._w_outer = (w_base - w)/(self.n_outer*w_base - np.sum(w))
@@ -27,98 +55,343 @@ class DLMCMA(ES):  # in `pypoplib` folder
         self.m_max = 2*int(np.ceil(np.sqrt(self.ndim_problem)))
         self.m_list = np.arange(1, self.m_max) + 1
         self.p_list = 1.0/len(self.m_list)*np.ones((len(self.m_list)))
+        # whether or not to run the outer loop *asynchronously* (without any synchronization barrier)
+        self.is_asynchronous = options.get('is_asynchronous', False)
+        assert not self.is_asynchronous or (self.checkpoint is None and self.resume_from is None),\
+            'checkpointing is supported only for the synchronous outer loop.'
+        assert not (self.is_asynchronous and self.is_adaptive_runtime),\
+            'adaptive runtime of inner ESs is supported only for the synchronous outer loop.'
+        # maximal number of resubmissions (with the same configuration) of each failed inner ES (e.g., when its
+        #   worker unexpectedly exits owing to OOM or SIGKILL), after which it is dropped (only for this cycle)
+        self.max_retries = options.get('max_retries', 1)
+        assert self.max_retries >= 0
+        self._failures = []  # to record all failed runs of inner ESs
+        self._n_dropped = 0  # number of dropped inner ESs (after all their attempts failed)
+        # whether or not the `q` of each inner ES is held only by the backend (until fetched by `_fetch`)
+        self._is_held = np.zeros((self.n_inner_es,), dtype=bool)
 
     def optimize(self, fitness_function=None):  # for all iterations (generations)
         super(ES, self).optimize(fitness_function)
         fitness = []  # to store all fitness generated during search
-        # https://docs.ray.io/en/latest/ray-core/scheduling/ray-oom-prevention.html
-        ray.init(address='auto',  # to assume the ray clustering computing platform is available
-            runtime_env={'py_modules': ['./pypoplib'],  # this local folder is shared across all nodes
-                'env_vars': {'OPENBLAS_NUM_THREADS': '1',  # to close *multi-thread* for avoiding possible conflicts
-                    'MKL_NUM_THREADS': '1',  # to close *multi-thread* for avoiding possible conflicts
-                    'OMP_NUM_THREADS': '1',  # to close *multi-thread* for avoiding possible conflicts
-                    'NUMEXPR_NUM_THREADS': '1',  # to close *multi-thread* for avoiding possible conflicts
-                    'RAY_memory_monitor_refresh_ms': '0'}})  # to avoid Out-Of-Memory Prevention
-        ray_problem = ray.put(self.problem)  # to be shared across all nodes
-        ray_opt = ray.remote(num_cpus=1)(LMCMA)  # to be shared across all nodes
-        # to avoid repeated coping and communication of the same data over network,
-        #   use *ray.put* to upload them to the shared memory in each node only once
-        sv, rm = load_sr(self.fitness_function, np.empty((self.ndim_problem,)))
-        ray_args = ray.put({'shift_vector': sv, 'rotation_matrix': rm})
-        is_first_generation = True  # flag to mark the first generation
-        x, xx = self.rng_optimization.uniform(self.lower_boundary, self.upper_boundary,
-            size=(self.n_inner_es, self.ndim_problem)), None  # to save the best-so-far solutions from all inner ESs
+        if self.backend == 'ray':
+            backend = RayBackend(memory_budget=self.memory_budget)
+        elif self.backend == 'local':
+            backend = LocalBackend(self.options.get('n_workers'), self.memory_budget)
+        else:
+            backend = self.backend
+        if self._profiler is not None:
+            self._profiler.instrument(backend, {'sync': ['wait', 'get', 'read_q'], 'submit': ['submit']})
+        backend.start(self.problem, self.fitness_function, {'max_runtime': self.runtime_inner_es,
+            'fitness_threshold': self.fitness_threshold, 'verbose': False, 'saving_fitness': 100},
+            self.n_inner_es, self.m_max)
+        x = self.rng_optimization.uniform(self.lower_boundary, self.upper_boundary,
+            size=(self.n_inner_es, self.ndim_problem))  # to save the best-so-far solutions from all inner ESs
         y = np.empty((self.n_inner_es,))  # to save the best-so-far fitness from all inner ESs
-        p, pp = np.zeros((self.n_inner_es, self.ndim_problem)), None
-        w, ww = np.zeros((self.n_inner_es,)), None
-        q, qq = np.zeros((self.n_inner_es, self.m_max, self.ndim_problem)), None
-        s, ss = np.empty((self.n_inner_es,)), None
-        m, mm = np.empty((self.n_inner_es,)), None
-        options = [None]*self.n_inner_es
-        while not self._check_terminations():
-            ray_es, ray_results = [], []
-            for i in range(self.n_inner_es):  # to run in parallel (driven by the engine of ray)
-                if is_first_generation:
-                    m_ray = int(self.rng_optimization.choice(self.m_list, p=self.p_list))
-                    mean_ray, p_ray, w_ray, q_ray = x[i], p[i], w[i], q[i][-m_ray:]
-                    s_ray = self.rng_optimization.uniform(1e-16, 1e-15 + self.sigma)
-                else:
-                    # to use *elitist* to avoid regression/stagnation (when global step-size is small for convergence)
-                    if i < self.n_outer:
-                        o_i = order[i]
-                        m_ray = int(m[o_i])
-                        mean_ray, p_ray, w_ray, q_ray, s_ray = x[o_i], p[o_i], w[o_i], q[o_i][-m_ray:], s[o_i], 
-                    elif i < self.n_outer*2: # to use recombination
-                        o_i = order[i - self.n_outer]
-                        mean_ray = (x[o_i] + xx)/2.0
-                        p_ray = (p[o_i] + pp)/np.sqrt(2.0)
-                        w_ray = (w[o_i] + ww)/np.sqrt(2.0)
-                        m_ray = int(np.ceil((m[o_i] + mm)/2.0))
-                        q_ray = (q[o_i][-m_ray:] + qq[-m_ray:])/np.sqrt(2.0)
-                        s_ray = (s[o_i] + ss)/np.sqrt(2.0)
-                    else:  # to mutate global step-size for diversity at meta-level
-                        m_ray = int(self.rng_optimization.choice(self.m_list, p=self.p_list))
-                        mean_ray, p_ray, w_ray, q_ray = xx, pp, ww, np.copy(qq[-m_ray:])
-                        if i < self.n_outer*2 + (self.n_inner_es - self.n_outer*2)/5:
-                            s_ray = self.rng_optimization.uniform(ss*0.3, ss*3.3)
-                        else:
-                            s_ray = self.rng_optimization.uniform(1e-16, 1e-15 + self.sigma)
-                options[i] = {'mean': mean_ray, 'p': p_ray, 'w': w_ray, 'q': q_ray, 'sigma': s_ray,
-                    'max_runtime': self.runtime_inner_es, 'fitness_threshold': self.fitness_threshold,
-                    'seed_rng': self.rng_optimization.integers(0, np.iinfo(np.int64).max),
-                    'verbose': False, 'saving_fitness': 100, 'm': m_ray}
-                ray_es.append(ray_opt.remote(ray_problem, options[i]))
-                ray_results.append(ray_es[i].optimize.remote(self.fitness_function, ray_args))
-            results = ray.get(ray_results)  # to synchronize (a time-consuming operation)
-            for i, r in enumerate(results):  # to run serially (clearly which should be light-weight)
-                if self.best_so_far_y > r['best_so_far_y']:  # to update best-so-far solution and fitness
-                    self.best_so_far_x, self.best_so_far_y = r['best_so_far_x'], r['best_so_far_y']
-                x[i], y[i], p[i], w[i], q[i][-options[i]['m']:], s[i], m[i] =\
-                    r['best_so_far_x'], r['best_so_far_y'], r['p'], r['w'], r['q'], r['sigma'], r['m']
-                fit_start, fit_end = np.copy(r['fitness'][0]), np.copy(r['fitness'][-1])
-                fit_start[0] += self.n_function_evaluations
-                fit_end[0] += self.n_function_evaluations
-                self.n_function_evaluations += r['n_function_evaluations']
-                self.time_function_evaluations += r['time_function_evaluations']
-                fitness.extend([fit_start, fit_end])
-            order, is_first_generation = np.argsort(y)[:self.n_outer], False
-            # to use *weighted multi-recombination* to update
-            xx = np.dot(self._w_outer, x[order])  # for mean
-            pp = np.dot(self._ww_outer, p[order])  # for evolution path
-            ww = np.dot(self._ww_outer, w[order])  # for global step-size
-            qq = np.zeros((q.shape[1], q.shape[2]))  # for covariance matrix
-            for i in range(self.n_outer):
-                qq[-int(m[order[i]]):] += self._ww_outer[i]*q[order[i]][-int(m[order[i]]):]
-            ss = np.dot(self._ww_outer, s[order])  # for global step-size
-            mm = np.dot(self._w_outer, m[order])
-        ray.shutdown()  # to clear the current ray environment
+        p = np.zeros((self.n_inner_es, self.ndim_problem))
+        w = np.zeros((self.n_inner_es,))
+        q = np.zeros((self.n_inner_es, self.m_max, self.ndim_problem))
+        s = np.empty((self.n_inner_es,))
+        m = np.empty((self.n_inner_es,))
+        if self.is_asynchronous:
+            self._optimize_asynchronously(backend, fitness, x, y, p, w, q, s, m)
+        else:
+            self._optimize_synchronously(backend, fitness, x, y, p, w, q, s, m)
+        backend.shutdown()
         return self._collect(fitness)
 
+    def _generate_options(self, slots, x, p, w, q, s, m, order=None, recombined=None):
+        """Generate the (cycle-variant) options of all inner ESs in `slots` (in ascending order) according to
+            their roles at meta-level, where all random numbers are drawn slot by slot (in the same order as
+            generating one by one) while all arithmetic is conducted per role on stacked arrays.
+
+            To avoid one (`len(slots)`, `m_max`, `ndim_problem`) block (plus its gathered copies) in each cycle, the
+            `q` of each inner ES has only its last `m` rows: either one read-only view (of its own `q` for the first
+            generation or of the recombined `q` for mutation, neither of which is modified until it finishes) or
+            one new array (for elitist and recombination, i.e., only 2*`n_outer` of them).
+        """
+        slots, n_mutation = np.asarray(slots), self.n_outer*2 + (self.n_inner_es - self.n_outer*2)/5
+        if recombined is None:  # for the first generation
+            roles = np.zeros((len(slots),), dtype=int)
+        else:  # 1 for elitist, 2 for recombination, 3 for mutation
+            roles = 1 + (slots >= self.n_outer) + (slots >= self.n_outer*2)
+        m_ray, s_ray = np.empty((len(slots),), dtype=int), np.empty((len(slots),))
+        seed_ray = np.empty((len(slots),), dtype=np.int64)
+        for k, (i, role) in enumerate(zip(slots, roles)):
+            if role in [0, 3]:
+                m_ray[k] = int(self.rng_optimization.choice(self.m_list, p=self.p_list))
+            if role == 0 or (role == 3 and i >= n_mutation):
+                s_ray[k] = self.rng_optimization.uniform(1e-16, 1e-15 + self.sigma)
+            elif role == 3:
+                s_ray[k] = self.rng_optimization.uniform(recombined[4]*0.3, recombined[4]*3.3)
+            seed_ray[k] = self.rng_optimization.integers(0, np.iinfo(np.int64).max)
+        mean_ray, p_ray = np.empty((len(slots), self.ndim_problem)), np.empty((len(slots), self.ndim_problem))
+        w_ray, q_ray = np.empty((len(slots),)), [None]*len(slots)
+        for role in np.unique(roles):
+            k = roles == role
+            if role == 0:
+                i = slots[k]
+                mean_ray[k], p_ray[k], w_ray[k] = x[i], p[i], w[i]
+                for kk, ii in zip(np.nonzero(k)[0], i):
+                    q_ray[kk] = q[ii, -m_ray[kk]:]
+                continue
+            xx, pp, ww, qq, ss, mm = recombined
+            if role == 1:  # to use *elitist* to avoid regression/stagnation (when global step-size is small)
+                o = order[slots[k]]
+                mean_ray[k], p_ray[k], w_ray[k], s_ray[k] = x[o], p[o], w[o], s[o]
+                m_ray[k] = m[o]
+                for kk, oo in zip(np.nonzero(k)[0], o):  # to copy, since `q[oo]` may be updated in the meantime
+                    q_ray[kk] = np.copy(q[oo, -m_ray[kk]:])
+            elif role == 2:  # to use recombination
+                o = order[slots[k] - self.n_outer]
+                mean_ray[k] = (x[o] + xx)/2.0
+                p_ray[k] = (p[o] + pp)/np.sqrt(2.0)
+                w_ray[k] = (w[o] + ww)/np.sqrt(2.0)
+                m_ray[k] = np.ceil((m[o] + mm)/2.0)
+                for kk, oo in zip(np.nonzero(k)[0], o):
+                    q_ray[kk] = np.add(q[oo, -m_ray[kk]:], qq[-m_ray[kk]:])
+                    q_ray[kk] /= np.sqrt(2.0)
+                s_ray[k] = (s[o] + ss)/np.sqrt(2.0)
+            else:  # to mutate global step-size for diversity at meta-level
+                mean_ray[k], p_ray[k], w_ray[k] = xx, pp, ww
+                for kk in np.nonzero(k)[0]:
+                    q_ray[kk] = qq[-m_ray[kk]:]
+        for q_k in q_ray:  # not to be modified in place by any backend
+            q_k.flags.writeable = False
+        return [{'mean': mean_ray[k], 'p': p_ray[k], 'w': w_ray[k], 'q': q_ray[k], 'sigma': s_ray[k],
+            'seed_rng': seed_ray[k], 'm': int(m_ray[k])} for k in range(len(slots))]
+
+    def _ingest(self, slots, results, fitness, x, y, p, w, q, s, m):
+        """Ingest all `results` of the inner ESs in `slots` (in place) via stacked array operations."""
+        slots, n_fe = np.asarray(slots), np.array([r['n_function_evaluations'] for r in results])
+        x[slots] = np.stack([r['best_so_far_x'] for r in results])
+        y[slots] = [r['best_so_far_y'] for r in results]
+        p[slots] = np.stack([r['p'] for r in results])
+        w[slots] = [r['w'] for r in results]
+        s[slots] = [r['sigma'] for r in results]
+        m[slots] = [r['m'] for r in results]
+        for i, r in zip(slots, results):  # owing to variable lengths (only one copy for each)
+            self._is_held[i] = r['q'] is None  # to be fetched only when needed
+            if not self._is_held[i]:
+                q[i, -r['m']:] = r['q']
+        k = np.argmin(y[slots])
+        if self.best_so_far_y > y[slots[k]]:  # to update best-so-far solution and fitness
+            self.best_so_far_x, self.best_so_far_y = results[k]['best_so_far_x'], results[k]['best_so_far_y']
+        # to shift (1-based) numbers of function evaluations of each inner ES by all evaluations before it
+        fit = np.stack([np.stack((r['fitness'][0], r['fitness'][-1])) for r in results])
+        fit[:, :, 0] += (self.n_function_evaluations + np.cumsum(n_fe) - n_fe)[:, np.newaxis]
+        fitness.extend(fit.reshape(-1, 2))
+        self.n_function_evaluations += int(np.sum(n_fe))
+        self.time_function_evaluations += np.sum([r['time_function_evaluations'] for r in results])
+
+    def _fetch(self, backend, slots, y, q, m):
+        """Fetch the `q` of all inner ESs in `slots` held only by the backend (in place), where each lost one
+            (e.g., with its node) is dropped with the worst fitness."""
+        slots = np.asarray(slots)[self._is_held[slots]]
+        if len(slots) == 0:
+            return
+        for i, qq in zip(slots, backend.read_q(slots, m[slots].astype(int))):
+            if qq is None:
+                y[i] = np.Inf
+                self._n_dropped += 1
+            else:
+                q[i, -int(m[i]):] = qq
+        self._is_held[slots] = False
+
+    def _recombine(self, order, x, p, w, q, s, m):
+        """Use *weighted multi-recombination* of all the `order`-ed inner ESs at meta-level."""
+        xx = np.dot(self._w_outer, x[order])  # for mean
+        pp = np.dot(self._ww_outer, p[order])  # for evolution path
+        ww = np.dot(self._ww_outer, w[order])  # for global step-size
+        # to mask out all invalid (i.e., not the last `m`) rows of each inner ES for covariance matrix
+        mask = np.arange(self.m_max) >= (self.m_max - m[order].astype(int))[:, np.newaxis]
+        qq = np.einsum('kj,kjd->jd', self._ww_outer[:, np.newaxis]*mask, q[order])
+        ss = np.dot(self._ww_outer, s[order])  # for global step-size
+        mm = np.dot(self._w_outer, m[order])
+        return xx, pp, ww, qq, ss, mm
+
+    def _checkpoint(self, fitness, x, y, p, w, q, s, m, order, recombined):
+        """Save all state of the outer loop at the end of one cycle (including records of all cycles and failures,
+            saved as JSON strings)."""
+        xx, pp, ww, qq, ss, mm = recombined
+        self._save_checkpoint(fitness, x=x, y=y, p=p, w=w, q=q, s=s, m=m, order=order,
+            xx=xx, pp=pp, ww=ww, qq=qq, ss=ss, mm=mm, runtime_inner_es=self._runtime_inner_es,
+            rate=np.nan if self._rate is None else self._rate, cycles=json.dumps(self._cycles),
+            failures=json.dumps(self._failures), n_dropped=self._n_dropped)
+
+    def _resume(self, fitness, x, y, p, w, q, s, m):
+        """Restore all state saved by `_checkpoint` from `self.resume_from` (in place) and return `order` and
+            `recombined` for the next cycle."""
+        state = self._load_checkpoint(fitness)
+        x[:], y[:], p[:], w[:], q[:], s[:], m[:] = [state[k] for k in ['x', 'y', 'p', 'w', 'q', 's', 'm']]
+        self._runtime_inner_es = float(state['runtime_inner_es'])
+        self._rate = None if np.isnan(state['rate']) else float(state['rate'])
+        self._cycles, self._failures = json.loads(str(state['cycles'])), json.loads(str(state['failures']))
+        self._n_dropped = int(state['n_dropped'])
+        return state['order'], tuple(state[k] for k in ['xx', 'pp', 'ww', 'qq', 'ss', 'mm'])
+
+    def _get(self, backend, i, handle):
+        """Get the results of the `i`-th inner ES, or `None` (after recovering its worker) if it failed.
+
+            Since the results (including all numbers of function evaluations) of one failed run are lost, none of
+            its function evaluations are counted.
+        """
+        try:
+            return backend.get(handle)
+        except Exception as e:  # e.g., when its worker unexpectedly exits (owing to OOM or SIGKILL)
+            self._failures.append({'slot': int(i), 'runtime': time.time() - self.start_time, 'error': repr(e)})
+            backend.recover(i)
+            return None
+
+    def _is_retried(self, n_attempts):
+        # not to retry after the maximal runtime, since each attempt needs one whole inner runtime
+        return n_attempts < self.max_retries and (time.time() - self.start_time) < self.max_runtime
+
+    def _drop(self, i, options, x, y, p, w, q, s, m):
+        """Drop the `i`-th inner ES by resetting its state to its (submitted) configuration with the worst fitness,
+            so that it can be selected at meta-level only after all survivors."""
+        x[i], y[i], p[i], w[i], q[i, -options['m']:], s[i], m[i] = options['mean'], np.Inf,\
+            options['p'], options['w'], options['q'], options['sigma'], options['m']
+        self._is_held[i] = False
+        self._n_dropped += 1
+
+    def _schedule_runtime(self, n_rounds):
+        """Return the runtime of inner ESs for the next cycle, or `None` if no cycle can be finished within the
+            remaining runtime (only for the adaptive runtime), where each cycle lasts one inner runtime per round
+            (`n_rounds`) of inner ESs run one after another on (shared) workers."""
+        if not self.is_adaptive_runtime:
+            return self.runtime_inner_es
+        # to reserve the synchronization overhead of the last cycle
+        overhead = self._cycles[-1]['overhead'] if len(self._cycles) > 0 else 0.0
+        remaining = (self.max_runtime - (time.time() - self.start_time) - overhead)/n_rounds
+        if remaining < self.min_runtime_inner_es:
+            return None
+        if remaining < self._runtime_inner_es + self.min_runtime_inner_es:  # to size the last cycle exactly
+            return remaining
+        return self._runtime_inner_es
+
+    def _adapt_runtime(self, cycle, y_bak, s):
+        """Adapt the runtime of inner ESs for the next cycle multiplicatively after one `cycle`.
+
+            It is shortened only when the (relative) improvement rate of the best-so-far fitness exceeds one target
+            rate, i.e., when recombination at meta-level pays off. The target rate is the maximal rate so far
+            decayed by `rate_decay` per cycle (and zero for the first adaptation), so that any cycle (including
+            the early ones) can be shortened while its improvement keeps up with the recent ones. Otherwise, it is
+            lengthened, so are cycles whose synchronization overhead is more than 10% or whose median global
+            step-size collapses near convergence.
+        """
+        if not np.isfinite(y_bak):  # not for the first cycle
+            return
+        rate = (y_bak - self.best_so_far_y)/(np.abs(y_bak) + 1e-300)/cycle['runtime']
+        target = 0.0 if self._rate is None else self.rate_decay*self._rate
+        is_lengthened = (cycle['overhead'] > 0.1*cycle['runtime']) or (np.median(s) < 1e-8*self.sigma)
+        if (rate > target) and not is_lengthened:
+            self._runtime_inner_es *= 0.8
+        else:
+            self._runtime_inner_es *= 1.25
+        self._runtime_inner_es = float(np.clip(self._runtime_inner_es,
+            self.min_runtime_inner_es, self.max_runtime_inner_es))
+        self._rate = max(rate, target)
+
+    def _optimize_synchronously(self, backend, fitness, x, y, p, w, q, s, m):
+        order, recombined = None, None  # `None` to mark the first generation
+        if self.resume_from is not None:  # to continue one (interrupted) run from its checkpoint
+            order, recombined = self._resume(fitness, x, y, p, w, q, s, m)
+        n_rounds = int(np.ceil(self.n_inner_es/(backend.capacity() or self.n_inner_es)))  # without any failure
+        while not self._check_terminations():
+            runtime_inner_es, start_time, y_bak = self._schedule_runtime(n_rounds), time.time(), self.best_so_far_y
+            if runtime_inner_es is None:
+                self.termination_signal = self.Terminations.MAX_RUNTIME
+                break
+            slots = np.arange(self.n_inner_es)
+            options = self._generate_options(slots, x, p, w, q, s, m, order, recombined)
+            for o in options:
+                o['max_runtime'] = runtime_inner_es
+            # to run in parallel (by the backend), where each task is mapped to its slot and number of attempts
+            pending = {backend.submit(i, o): (i, 0) for i, o in zip(slots, options)}
+            results, n_submitted = [None]*self.n_inner_es, self.n_inner_es
+            while len(pending) > 0:  # to synchronize (a time-consuming operation)
+                ready = backend.wait(pending)
+                i, n_attempts = pending.pop(ready)
+                results[i] = self._get(backend, i, ready)
+                if results[i] is None and self._is_retried(n_attempts):  # to resubmit the same configuration
+                    pending[backend.submit(i, options[i])] = i, n_attempts + 1
+                    n_submitted += 1
+                elif results[i] is None:
+                    self._drop(i, options[i], x, y, p, w, q, s, m)
+            survivors = [i for i in slots if results[i] is not None]  # to ingest in order of slots as before
+            if len(survivors) > 0:
+                self._ingest(survivors, [results[i] for i in survivors], fitness, x, y, p, w, q, s, m)
+            order = np.argsort(y)[:self.n_outer]
+            while np.any(self._is_held[order]):  # to fetch the `q` of only elites (since others are never used)
+                self._fetch(backend, order, y, q, m)
+                order = np.argsort(y)[:self.n_outer]
+            recombined = self._recombine(order, x, p, w, q, s, m)
+            cycle = {'runtime_inner_es': runtime_inner_es, 'runtime': time.time() - start_time}
+            # number of rounds of inner ESs run one after another on (shared) workers, whose queueing time is
+            #   not counted as (synchronization) overhead
+            cycle['n_rounds'] = int(np.ceil(n_submitted/(backend.capacity() or n_submitted)))
+            cycle['overhead'] = cycle['runtime'] - cycle['n_rounds']*runtime_inner_es  # mainly for synchronization
+            cycle['best_so_far_y'], cycle['sigma'] = self.best_so_far_y, float(np.median(s))
+            self._cycles.append(cycle)
+            if self.is_adaptive_runtime:
+                self._adapt_runtime(cycle, y_bak, s)
+            if self._is_checkpoint_due():
+                self._checkpoint(fitness, x, y, p, w, q, s, m, order, recombined)
+
+    def _optimize_asynchronously(self, backend, fitness, x, y, p, w, q, s, m):
+        """Run without any barrier: as soon as one inner ES finishes, its results are merged into the elite
+            archive (i.e., the best `n_outer` inner ESs finished so far), the weighted multi-recombination is
+            updated (only when the elite archive changes), and its slot is restarted with a new configuration
+            immediately. Before `n_outer` inner ESs have finished, all freed slots are restarted as the first
+            generation. After termination, no slot is restarted but all running inner ESs are still waited for.
+
+            When the backend cannot run all inner ESs at the same time, at most its `capacity` of them are submitted
+            (i.e., running) at any time and all other slots wait in a queue: each finished slot joins its end and
+            the slot at its head is started (with a configuration generated just then) instead, so that no task is
+            queued inside the backend and started after termination.
+        """
+        y[:] = np.Inf  # for all not-yet-finished inner ESs
+        is_finished = np.zeros((self.n_inner_es,), dtype=bool)
+        order, recombined = None, None  # `None` to mark the first generation
+        pending = {}  # to map each running task to its slot, configuration, and number of attempts
+        slots = np.arange(self.n_inner_es)
+        n_running = min(self.n_inner_es, backend.capacity() or self.n_inner_es)
+        waiting = collections.deque(slots[n_running:])  # all slots waiting to be started (in order)
+        for i, options in zip(slots[:n_running], self._generate_options(slots[:n_running], x, p, w, q, s, m)):
+            pending[backend.submit(i, options)] = i, options, 0
+        while len(pending) > 0:
+            ready = backend.wait(pending)
+            i, options, n_attempts = pending.pop(ready)
+            results = self._get(backend, i, ready)
+            if results is not None:
+                self._ingest([i], [results], fitness, x, y, p, w, q, s, m)
+                # to fetch at once, since its `q` held by the backend is overwritten by its next run at any time
+                self._fetch(backend, [i], y, q, m)
+                is_finished[i] = True
+            elif self._is_retried(n_attempts):  # to resubmit the same configuration
+                pending[backend.submit(i, options)] = i, options, n_attempts + 1
+                continue
+            else:  # to drop it (while keeping the state of its last finished run, if any)
+                self._n_dropped += 1
+            if np.sum(is_finished) >= self.n_outer:
+                new_order = np.argsort(y)[:self.n_outer]
+                if (recombined is None) or (i in order) or (i in new_order):  # only when the elites change
+                    order = new_order
+                    recombined = self._recombine(order, x, p, w, q, s, m)
+            if not self._check_terminations():
+                waiting.append(i)
+                i = waiting.popleft()
+                options = self._generate_options([i], x, p, w, q, s, m, order, recombined)[0]
+                pending[backend.submit(i, options)] = i, options, 0
+
     def _collect(self, fitness=None, y=None, mean=None):
-        return {'best_so_far_x': self.best_so_far_x,
+        return self._collect_profile({'best_so_far_x': self.best_so_far_x,
             'best_so_far_y': self.best_so_far_y,
             'n_function_evaluations': self.n_function_evaluations,
             'runtime': time.time() - self.start_time,
             'termination_signal': self.termination_signal,
             'time_function_evaluations': self.time_function_evaluations,
-            'fitness': np.array(fitness)}
+            'fitness': np.array(fitness),
+            'failures': self._failures,  # all failed runs of inner ESs
+            'n_dropped_inner_es': self._n_dropped,
+            'cycles': self._cycles})  # timing (and progress) of all cycles (only for the synchronous outer loop)
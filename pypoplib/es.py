@@ -113,6 +113,9 @@ class ES(Optimizer):
     In Synergetics—from Microscopic to Macroscopic Order (pp. 122-132). Springer, Berlin, Heidelberg.
     https://link.springer.com/chapter/10.1007/978-3-642-69540-7_13
     """
+    _PHASES = dict(Optimizer._PHASES, sample=['_sample'], update=['_update_distribution'],
+                   restart=['restart_reinitialize'])
+
     def __init__(self, problem, options):
         Optimizer.__init__(self, problem, options)
         self.options = options
@@ -170,12 +173,9 @@ class ES(Optimizer):
         return mean
 
     def _print_verbose_info(self, fitness, y, is_print=False):
-        if y is not None:
-            if self.saving_fitness:
-                if not np.isscalar(y):
-                    fitness.extend(y)
-                else:
-                    fitness.append(y)
+        if (y is not None) and (fitness is not None):
+            if self.saving_fitness:  # only the first `n_function_evaluations` fitness (i.e., all evaluated)
+                fitness.append(y, self.n_function_evaluations)
         if self.verbose:
             is_verbose = self._printed_evaluations != self.n_function_evaluations  # to avoid repeated printing
             is_verbose_1 = (not self._n_generations % self.verbose) and is_verbose
@@ -197,7 +197,7 @@ class ES(Optimizer):
             is_restart_2 = (self._list_fitness[-self.stagnation] - self._list_fitness[-1]) < self.fitness_diff
         is_restart = bool(is_restart_1) or bool(is_restart_2)
         if is_restart:
-            self._print_verbose_info([], y, True)
+            self._print_verbose_info(None, y, True)
             if self.verbose:
                 print(' ....... *** restart *** .......')
             self._n_restart += 1
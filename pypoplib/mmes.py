@@ -22,7 +22,18 @@ class MMES(ES):
         # set success probability of geometric distribution (different from 4/n in the original paper)
         self.c_a = options.get('c_a', 3.8/self.ndim_problem)  # same as Matlab code
         self.gamma = options.get('gamma', 1.0 - np.power(1.0 - self.c_a, self.m))
+        # whether or not to draw all random numbers in the same (per-offspring) order as the original loop-based
+        #   sampling, in order to reproduce its results exactly (only for checking, since it is slower)
+        self.is_legacy_sampling = options.get('is_legacy_sampling', False)
+        # set number of offspring evaluated in one (vectorized) call, between which terminations are checked
+        #   (if `None`, each offspring is evaluated one by one, as the original). Note that when the maximal
+        #   runtime expires in the middle of one batch, the whole batch is still evaluated (and counted), so the
+        #   actual runtime may exceed `max_runtime` by (at most) one batch of evaluations; however, each batch is
+        #   truncated so that `max_function_evaluations` is never exceeded.
+        self.batch_size = options.get('batch_size')
+        assert self.batch_size is None or self.batch_size > 0
         self._n_mirror_sampling = None
+        self._gaps = None  # gaps of recorded generations between consecutive evolution paths (ordered by `v`)
         self._z_1 = np.sqrt(1.0 - self.gamma)
         self._z_2 = np.sqrt(self.gamma/self.ms)
         self._p_1 = 1.0 - self.c_c
@@ -40,24 +51,48 @@ class MMES(ES):
         assert q.shape[0] == self.m
         t = np.zeros((self.m,))  # recorded generations
         v = np.arange(self.m)  # indexes to evolution paths
+        self._gaps = np.zeros((self.m - 1,))  # always equal to `t[v[1:]] - t[v[:-1]]` (updated in place)
         y = np.tile(self._evaluate_fitness(x=mean, args=args), (self.n_individuals,))  # fitness
         return x, mean, p, w, q, t, v, y
 
+    def _sample(self, x=None, mean=None, q=None, v=None):
+        n_m = self._n_mirror_sampling
+        if self.is_legacy_sampling:  # to draw in the same order as the original per-offspring loop
+            g, a = np.empty((n_m, self.ms), dtype=np.int64), np.empty((n_m, self.ms))
+            z = np.empty((n_m, self.ndim_problem))
+            for k in range(n_m):
+                for j in range(self.ms):
+                    g[k, j] = self.rng_optimization.geometric(self.c_a)
+                    a[k, j] = self.rng_optimization.standard_normal()
+                z[k] = self.rng_optimization.standard_normal((self.ndim_problem,))
+        else:  # to draw all random numbers via only three calls
+            g = self.rng_optimization.geometric(self.c_a, size=(n_m, self.ms))
+            a = self.rng_optimization.standard_normal((n_m, self.ms))
+            z = self.rng_optimization.standard_normal((n_m, self.ndim_problem))
+        j_k = v[(self.m - g % self.m) - 1]  # indexes of all selected direction vectors
+        zq = np.zeros((n_m, self.ndim_problem))
+        for j in range(self.ms):  # to accumulate in the same order as the original loop
+            zq += a[:, j:(j + 1)]*q[j_k[:, j]]
+        z *= self._z_1
+        z += self._z_2*zq
+        x[:n_m] = mean + self.sigma*z  # mirror sampling
+        x[n_m:] = mean - self.sigma*z[:(self.n_individuals - n_m)]
+        return x
+
     def iterate(self, x=None, mean=None, q=None, v=None, y=None, args=None):
-        for k in range(self._n_mirror_sampling):  # mirror sampling
-            zq = np.zeros((self.ndim_problem,))
-            for _ in range(self.ms):
-                j_k = v[(self.m - self.rng_optimization.geometric(self.c_a) % self.m) - 1]
-                zq += self.rng_optimization.standard_normal()*q[j_k]
-            z = self._z_1*self.rng_optimization.standard_normal((self.ndim_problem,))
-            z += self._z_2*zq
-            x[k] = mean + self.sigma*z
-            if (self._n_mirror_sampling + k) < self.n_individuals:
-                x[self._n_mirror_sampling + k] = mean - self.sigma*z
-        for k in range(self.n_individuals):
+        x = self._sample(x, mean, q, v)
+        if self.batch_size is None:
+            for k in range(self.n_individuals):
+                if self._check_terminations():
+                    return x, y
+                y[k] = self._evaluate_fitness(x[k], args)
+            return x, y
+        for k in range(0, self.n_individuals, self.batch_size):
             if self._check_terminations():
                 return x, y
-            y[k] = self._evaluate_fitness(x[k], args)
+            k_end = int(min(k + self.batch_size, self.n_individuals,
+                            k + self.max_function_evaluations - self.n_function_evaluations))
+            y[k:k_end] = self._evaluate_fitness_batch(x[k:k_end], args)
         return x, y
 
     def _update_distribution(self, x=None, mean=None, p=None, w=None, q=None,
@@ -70,12 +105,19 @@ class MMES(ES):
         if self._n_generations < self.m:
             q[self._n_generations] = p
         else:
-            k_star = np.argmin(t[v[1:]] - t[v[:(self.m - 1)]])
-            k_star += 1
-            if t[v[k_star]] - t[v[k_star - 1]] > self.distance:
-                k_star = 0
-            v = np.append(np.append(v[:k_star], v[(k_star + 1):]), v[k_star])
-            t[v[-1]], q[v[-1]] = self._n_generations, p
+            # to treat `v` as a ring of indexes and update it (and its gaps) in place without any reallocation
+            k_star = 0
+            if self.m > 1:  # one scan of all `m` - 1 gaps, costing no more than shifting them below (O(m) anyway)
+                k_star = int(np.argmin(self._gaps)) + 1
+                if self._gaps[k_star - 1] > self.distance:
+                    k_star = 0
+            j_star = v[k_star]
+            if 0 < k_star < self.m - 1:  # to merge two gaps around the removed one
+                self._gaps[k_star - 1] += self._gaps[k_star]
+            v[k_star:-1], self._gaps[k_star:-1] = v[(k_star + 1):], self._gaps[(k_star + 1):]
+            v[-1], t[j_star], q[j_star] = j_star, self._n_generations, p
+            if self.m > 1:
+                self._gaps[-1] = t[j_star] - t[v[-2]]
         # conduct success-based mutation strength adaptation
         l_w = np.dot(self._w, y_bak[:self.n_parents] > y[:self.n_parents])
         w = self._w_1*w + self._w_2*np.sqrt(self._mu_eff)*(2*l_w - 1)
@@ -89,10 +131,34 @@ class MMES(ES):
             self._print_verbose_info(fitness, y[0])
         return x, mean, p, w, q, t, v, y
 
+    def _checkpoint(self, fitness, x=None, mean=None, p=None, w=None, q=None, t=None, v=None, y=None):
+        """Save all state returned by `initialize` and `_update_distribution` (and all restart-related ones)."""
+        self._save_checkpoint(fitness, x=x, mean=mean, p=p, w=w, q=q, t=t, v=v, y=y, sigma=self.sigma,
+            gaps=self._gaps, n_individuals=self.n_individuals, n_parents=self.n_parents,
+            n_generations=self._n_generations, n_restart=self._n_restart,
+            list_generations=np.array(self._list_generations), list_fitness=np.array(self._list_fitness))
+
+    def _resume(self, fitness):
+        """Restore all state saved by `_checkpoint` from `self.resume_from`."""
+        state = self._load_checkpoint(fitness)
+        self.sigma, self._gaps = float(state['sigma']), state['gaps']
+        self.n_individuals, self.n_parents = int(state['n_individuals']), int(state['n_parents'])
+        if self.n_parents > 1:  # which may have been changed by restarts
+            self._w, self._mu_eff = self._compute_weights()
+        self._n_mirror_sampling = int(np.ceil(self.n_individuals/2))
+        self._n_generations, self._n_restart = int(state['n_generations']), int(state['n_restart'])
+        self._list_generations = state['list_generations'].tolist()
+        self._list_fitness = state['list_fitness'].tolist()
+        self._printed_evaluations = self.n_function_evaluations
+        return [state[k] for k in ['x', 'mean', 'p', 'w', 'q', 't', 'v', 'y']]
+
     def optimize(self, fitness_function=None, args=None):  # for all generations (iterations)
         fitness = ES.optimize(self, fitness_function)
-        x, mean, p, w, q, t, v, y = self.initialize(args)
-        self._print_verbose_info(fitness, y[0])
+        if self.resume_from is None:
+            x, mean, p, w, q, t, v, y = self.initialize(args)
+            self._print_verbose_info(fitness, y[0])
+        else:  # to continue one (interrupted) run from its checkpoint
+            x, mean, p, w, q, t, v, y = self._resume(fitness)
         while not self._check_terminations():
             y_bak = np.copy(y)
             # sample and evaluate offspring population
@@ -102,6 +168,8 @@ class MMES(ES):
             self._print_verbose_info(fitness, y)
             x, mean, p, w, q, t, v, y = self.restart_reinitialize(
                 args, x, mean, p, w, q, t, v, y, fitness)
+            if self._is_checkpoint_due():
+                self._checkpoint(fitness, x, mean, p, w, q, t, v, y)
         results = self._collect(fitness, y, mean)
         results['p'] = p
         results['w'] = w
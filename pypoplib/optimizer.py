@@ -1,8 +1,12 @@
+import os
+import json
 import time
 from enum import IntEnum
 
 import numpy as np
 
+from pypoplib.profiling import Profiler
+
 
 class Terminations(IntEnum):
     """Helper class used by all optimizer classes."""
@@ -12,6 +16,77 @@ class Terminations(IntEnum):
     FITNESS_THRESHOLD = 3  # threshold of fitness (when the best-so-far fitness is below it, the optimizer will stop)
 
 
+class FitnessHistory(object):
+    """Online compressor of all fitness generated during optimization (only if `saving_fitness` > 0).
+
+        Rather than storing all fitness (one Python `float` per evaluation), only every `saving_fitness`-th
+        best-so-far fitness (and its index) is kept as it goes, in one preallocated and chunked `float64` buffer,
+        so that its memory is O(`n_function_evaluations`/`saving_fitness`) rather than O(`n_function_evaluations`).
+        Its compressed convergence curve is the same as that of `Optimizer._compress_fitness` for all fitness.
+    """
+    def __init__(self, saving_fitness, chunk_size=4096):
+        self.saving_fitness = saving_fitness
+        self.chunk_size = chunk_size  # number of rows of each chunk
+        self.n_fitness = 0  # number of all fitness recorded so far
+        self.best_fitness = np.Inf  # best-so-far fitness
+        self._chunks = []  # all chunks of rows, each of which is (0-based index, best-so-far fitness)
+        self._n_rows = 0  # number of rows used in all chunks
+
+    def _push(self, rows):
+        while len(rows) > 0:
+            if self._n_rows == len(self._chunks)*self.chunk_size:  # to allocate one new chunk only when full
+                self._chunks.append(np.empty((self.chunk_size, 2)))
+            i = self._n_rows % self.chunk_size
+            n = min(len(rows), self.chunk_size - i)
+            self._chunks[-1][i:(i + n)] = rows[:n]
+            self._n_rows += n
+            rows = rows[n:]
+
+    def append(self, y, n_max=None):
+        """Record fitness `y` (a scalar or one array), where only the first `n_max` fitness (e.g., the number of
+            function evaluations) are recorded in total, to exclude those not evaluated."""
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+        if n_max is not None:
+            y = y[:max(n_max - self.n_fitness, 0)]
+        if len(y) == 0:
+            return
+        y = np.minimum(np.minimum.accumulate(y), self.best_fitness)  # arrange in non-increasing order
+        k = np.arange((-self.n_fitness) % self.saving_fitness, len(y), self.saving_fitness)  # to keep
+        self._push(np.stack((self.n_fitness + k, y[k]), 1))
+        self.n_fitness += len(y)
+        self.best_fitness = y[-1]
+
+    def get_rows(self):
+        """Get all rows kept so far as one `ndarray` of shape (`n_rows`, 2)."""
+        if len(self._chunks) == 0:
+            return np.empty((0, 2))
+        return np.concatenate(self._chunks)[:self._n_rows]
+
+    def compress(self):
+        """Get the compressed convergence curve (the same as `Optimizer._compress_fitness`)."""
+        if self.n_fitness == 0:
+            return None
+        rows = self.get_rows()
+        if self.saving_fitness == 1:
+            rows[:, 0] += 1  # use 1-based index
+            return rows
+        if rows[-1, 0] == self.n_fitness - 1:  # to not repeat the last one
+            rows = rows[:-1]
+        rows = np.vstack((rows, [self.n_fitness - 1, self.best_fitness]))
+        rows[0, 0], rows[-1, 0] = 1, self.n_fitness  # recover 1-based index
+        return rows
+
+    def get_state(self):
+        """Get its state (only arrays) for checkpointing."""
+        return {'fitness': self.get_rows(), 'n_fitness': self.n_fitness, 'best_fitness': self.best_fitness}
+
+    def set_state(self, fitness, n_fitness, best_fitness):
+        """Restore its state (returned by `get_state`) from one checkpoint."""
+        self._chunks, self._n_rows = [], 0
+        self._push(np.asarray(fitness, dtype=np.float64).reshape(-1, 2))
+        self.n_fitness, self.best_fitness = int(n_fitness), float(best_fitness)
+
+
 class Optimizer(object):
     """Base (abstract) class of all optimizers for continuous black-box **minimization**.
 
@@ -38,6 +113,10 @@ class Optimizer(object):
     Berlin: Springer International Publishing.
     https://link.springer.com/book/10.1007/978-3-319-68913-5
     """
+    # all phases (each of which maps to its methods) to be profiled (only if `profiling` is enabled)
+    _PHASES = {'evaluate': ['_evaluate_fitness', '_evaluate_fitness_batch'],
+               'termination': ['_check_terminations']}
+
     def __init__(self, problem, options):
         # problem-related settings
         self.problem = problem
@@ -68,6 +147,16 @@ class Optimizer(object):
         self.rng_optimization = np.random.default_rng(self.seed_optimization)
         self.saving_fitness = options.get('saving_fitness', 0)
         self.verbose = options.get('verbose', 10)
+        # set options for *checkpointing* (only for long runs), where each checkpoint is saved atomically as one
+        #   compact `.npz` file of arrays (without any pickle) and can be used to continue the run deterministically
+        self.checkpoint = options.get('checkpoint')  # file path to save checkpoints periodically (`None`: no saving)
+        self.checkpoint_interval = options.get('checkpoint_interval', 60.0)  # minimal interval (seconds) of saving
+        self.resume_from = options.get('resume_from')  # file path of one checkpoint to resume from
+        # set options for *profiling* (opt-in), where wall-clock time of each phase is counted and returned as
+        #   `profile` in the results (and optionally streamed to one local metrics file as JSON lines)
+        self.profiling = options.get('profiling', False)  # whether or not to profile all phases
+        self.metrics_file = options.get('metrics_file')  # file path to stream all profiles to (`None`: no streaming)
+        self.metrics_interval = options.get('metrics_interval', 60.0)  # minimal interval (seconds) of streaming
 
         # auxiliary members
         self.Terminations = Terminations
@@ -81,6 +170,11 @@ class Optimizer(object):
         self.termination_signal = 0  # NO_TERMINATION
         self.fitness = None
         self.is_restart = options.get('is_restart', True)
+        self._checkpoint_time = None  # time of saving the last checkpoint
+        self._profiler = None
+        if self.profiling:  # otherwise, no method is wrapped (i.e., without any overhead)
+            self._profiler = Profiler(self.metrics_file, self.metrics_interval)
+            self._profiler.instrument(self, self._PHASES)
 
     def _evaluate_fitness(self, x, args=None):
         self.start_function_evaluations = time.time()
@@ -95,6 +189,29 @@ class Optimizer(object):
             self.best_so_far_x, self.best_so_far_y = np.copy(x), y
         return float(y)
 
+    def _evaluate_fitness_batch(self, x, args=None):
+        """Evaluate all rows of the population `x` in one (vectorized) call and update all bookkeeping via
+            array reductions.
+
+            If the fitness function has a `batch` method (e.g., `pypoplib.continuous_functions.BoundFunction`),
+            it is used for vectorized evaluations; otherwise, all rows are evaluated one by one.
+        """
+        self.start_function_evaluations = time.time()
+        if hasattr(self.fitness_function, 'batch'):
+            y = self.fitness_function.batch(x)
+        elif args is None:
+            y = [self.fitness_function(xx) for xx in x]
+        else:
+            y = [self.fitness_function(xx, args['shift_vector'], args['rotation_matrix']) for xx in x]
+        y = np.asarray(y, dtype=np.float64)
+        self.time_function_evaluations += time.time() - self.start_function_evaluations
+        self.n_function_evaluations += len(y)
+        # update best-so-far solution (x) and fitness (y)
+        i_min = np.argmin(y)
+        if y[i_min] < self.best_so_far_y:
+            self.best_so_far_x, self.best_so_far_y = np.copy(x[i_min]), y[i_min]
+        return y
+
     def _check_terminations(self):
         self.runtime = time.time() - self.start_time
         if self.n_function_evaluations >= self.max_function_evaluations:
@@ -109,11 +226,11 @@ class Optimizer(object):
         return termination_signal[0]
 
     def _compress_fitness(self, fitness):
-        fitness = np.array(fitness)
+        if isinstance(fitness, FitnessHistory):  # which has been compressed online
+            self.fitness = fitness.compress()
+            return
         # arrange in non-increasing order
-        for i in range(len(fitness) - 1):
-            if fitness[i] < fitness[i + 1]:
-                fitness[i + 1] = fitness[i]
+        fitness = np.minimum.accumulate(np.array(fitness, dtype=np.float64))
         if self.saving_fitness == 1:
             self.fitness = np.stack((np.arange(1, len(fitness) + 1), fitness), 1)
         elif self.saving_fitness > 1:
@@ -125,6 +242,58 @@ class Optimizer(object):
             # recover 1-based index
             self.fitness[0, 0], self.fitness[-1, 0] = 1, len(fitness)
 
+    def _is_checkpoint_due(self):
+        # not to save the state of any generation interrupted by terminations (which should not be continued)
+        if (self.checkpoint is None) or (self.termination_signal != Terminations.NO_TERMINATION):
+            return False
+        last_time = self.start_time if self._checkpoint_time is None else self._checkpoint_time
+        return time.time() - last_time >= self.checkpoint_interval
+
+    def _save_checkpoint(self, fitness, **state):
+        """Save one checkpoint atomically, i.e., first to one temporary file and then rename it.
+
+        :param fitness: all fitness generated so far (`list` or `FitnessHistory`).
+        :param state: all other (optimizer-specific) state, each of which should be a number or an `ndarray`.
+        """
+        if isinstance(fitness, FitnessHistory):
+            state.update(fitness.get_state())
+        else:
+            state['fitness'] = np.array(fitness, dtype=np.float64)
+        # to save states of all bit generators as JSON strings, since they may contain 128-bit integers
+        state['rng_initialization'] = json.dumps(self.rng_initialization.bit_generator.state)
+        state['rng_optimization'] = json.dumps(self.rng_optimization.bit_generator.state)
+        state['n_function_evaluations'] = self.n_function_evaluations
+        state['time_function_evaluations'] = self.time_function_evaluations
+        state['runtime'] = time.time() - self.start_time
+        state['best_so_far_y'] = self.best_so_far_y
+        state['best_so_far_x'] = np.array([] if self.best_so_far_x is None else self.best_so_far_x)
+        with open(self.checkpoint + '.tmp', 'wb') as f:
+            np.savez(f, **state)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.checkpoint + '.tmp', self.checkpoint)  # atomic (for the same file system)
+        self._checkpoint_time = time.time()
+
+    def _load_checkpoint(self, fitness):
+        """Load one checkpoint (saved by `_save_checkpoint`), restore all common state (in place), and return
+            all other (optimizer-specific) state as one `dict` of `ndarray`.
+        """
+        with np.load(self.resume_from, allow_pickle=False) as data:
+            state = {k: data[k] for k in data.files}
+        if isinstance(fitness, FitnessHistory):
+            fitness.set_state(state.pop('fitness'), state.pop('n_fitness'), state.pop('best_fitness'))
+        else:
+            fitness.extend(state.pop('fitness'))
+        self.rng_initialization.bit_generator.state = json.loads(str(state.pop('rng_initialization')))
+        self.rng_optimization.bit_generator.state = json.loads(str(state.pop('rng_optimization')))
+        self.n_function_evaluations = int(state.pop('n_function_evaluations'))
+        self.time_function_evaluations = float(state.pop('time_function_evaluations'))
+        self.start_time = time.time() - float(state.pop('runtime'))  # to continue counting the runtime
+        self.best_so_far_y = float(state.pop('best_so_far_y'))
+        best_so_far_x = state.pop('best_so_far_x')
+        self.best_so_far_x = None if best_so_far_x.size == 0 else best_so_far_x
+        return state
+
     def _check_success(self):
         if (self.upper_boundary is not None) and (self.lower_boundary is not None) and (
                 np.any(self.lower_boundary > self.best_so_far_x) or np.any(self.best_so_far_x > self.upper_boundary)):
@@ -133,17 +302,26 @@ class Optimizer(object):
             return False
         return True
 
+    def _collect_profile(self, results):
+        """Add all profiled phases (if any) to the `results` and stream them for the last time."""
+        if self._profiler is not None:
+            results['profile'] = self._profiler.get_results()
+            self._profiler.write()
+        return results
+
     def _collect(self, fitness):
         if self.saving_fitness:
-            self._compress_fitness(fitness[:self.n_function_evaluations])
-        return {'best_so_far_x': self.best_so_far_x,
-                'best_so_far_y': self.best_so_far_y,
-                'n_function_evaluations': self.n_function_evaluations,
-                'runtime': time.time() - self.start_time,
-                'termination_signal': self.termination_signal,
-                'time_function_evaluations': self.time_function_evaluations,
-                'fitness': self.fitness,
-                'success': self._check_success()}
+            if not isinstance(fitness, FitnessHistory):  # which has been truncated when recorded
+                fitness = fitness[:self.n_function_evaluations]
+            self._compress_fitness(fitness)
+        return self._collect_profile({'best_so_far_x': self.best_so_far_x,
+                                      'best_so_far_y': self.best_so_far_y,
+                                      'n_function_evaluations': self.n_function_evaluations,
+                                      'runtime': time.time() - self.start_time,
+                                      'termination_signal': self.termination_signal,
+                                      'time_function_evaluations': self.time_function_evaluations,
+                                      'fitness': self.fitness,
+                                      'success': self._check_success()})
 
     def initialize(self):
         raise NotImplementedError
@@ -155,5 +333,6 @@ class Optimizer(object):
         self.start_time = time.time()
         if fitness_function is not None:
             self.fitness_function = fitness_function
-        fitness = []  # to store all fitness generated during evolution/optimization
+        # to store all fitness generated during evolution/optimization (compressed online)
+        fitness = FitnessHistory(self.saving_fitness) if self.saving_fitness else []
         return fitness
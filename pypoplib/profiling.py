@@ -0,0 +1,78 @@
+import json
+import time
+import functools
+
+import numpy as np
+
+
+class Profiler(object):
+    """Per-phase wall-clock counters and histograms of (bound) methods via `time.perf_counter_ns`.
+
+        Each phase (e.g., 'sample' or 'evaluate') consists of one or more methods of one object, which are
+        wrapped as its *instance* attributes only when profiling is enabled (see `instrument`), so that the
+        disabled case has no overhead at all. For each phase, the number of calls, total and maximal time, and one
+        histogram of durations with power-of-two buckets (i.e., the `k`-th bucket counts all calls lasting in
+        [2**(`k` - 1), 2**`k`) nanoseconds) are recorded. Note that phases may nest, e.g., 'restart' includes all
+        evaluations of reinitialization.
+
+        If `metrics_file` is given, one snapshot of all phases is appended to it as one JSON line at most every
+        `metrics_interval` seconds (checked only when one wrapped call ends) and once more at the end of the run.
+    """
+    def __init__(self, metrics_file=None, metrics_interval=60.0):
+        self.metrics_file = metrics_file  # file path to stream all snapshots to (`None`: no streaming)
+        self.metrics_interval = metrics_interval  # minimal interval (seconds) of streaming
+        self._phases = {}  # to map each phase to [number of calls, total time, maximal time, histogram]
+        self._next_write = None  # time (nanoseconds) of writing the next snapshot
+        if self.metrics_file is not None:
+            self._next_write = time.perf_counter_ns() + int(self.metrics_interval*1e9)
+
+    def wrap(self, phase, func):
+        """Wrap `func` to count all its calls (and their durations) for the given `phase`."""
+        stats = self._phases.setdefault(phase, [0, 0, 0, [0]*64])
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter_ns()
+                elapsed = end - start
+                stats[0] += 1
+                stats[1] += elapsed
+                if elapsed > stats[2]:
+                    stats[2] = elapsed
+                stats[3][elapsed.bit_length()] += 1
+                if (self._next_write is not None) and (end >= self._next_write):
+                    self.write()
+        return wrapper
+
+    def instrument(self, obj, phases):
+        """Wrap all methods of `obj` given in `phases` (`dict` mapping each phase to one list of method names),
+            where methods not defined by `obj` are skipped."""
+        for phase, names in phases.items():
+            for name in names:
+                if hasattr(obj, name):
+                    setattr(obj, name, self.wrap(phase, getattr(obj, name)))
+
+    def get_results(self):
+        """Get all (called) phases as one `dict` of number of calls, total/mean/maximal time (seconds), and
+            histogram (`ndarray` of 64 counts)."""
+        results = {}
+        for phase, (n_calls, total, maximum, histogram) in self._phases.items():
+            if n_calls > 0:
+                results[phase] = {'n_calls': n_calls,
+                                  'total_time': total/1e9,
+                                  'mean_time': total/n_calls/1e9,
+                                  'max_time': maximum/1e9,
+                                  'histogram': np.array(histogram, dtype=np.int64)}
+        return results
+
+    def write(self):
+        """Append one snapshot of all phases to the metrics file (as one JSON line)."""
+        if self.metrics_file is None:
+            return
+        phases = {k: dict(v, histogram=v['histogram'].tolist()) for k, v in self.get_results().items()}
+        with open(self.metrics_file, 'a') as f:
+            f.write(json.dumps({'time': time.time(), 'phases': phases}) + '\n')
+        self._next_write = time.perf_counter_ns() + int(self.metrics_interval*1e9)
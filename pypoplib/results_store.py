@@ -0,0 +1,160 @@
+import os
+import re
+import sys
+import glob
+import fcntl
+import pickle
+import argparse
+
+import numpy as np
+
+
+# metadata of each run (one fixed-size record per run), where all (ragged) convergence curves are concatenated in
+#   one separate file and each run refers to its own curve via `offset` and `length` (both in rows)
+META_DTYPE = np.dtype([('optimizer', 'U16'),
+                       ('function', 'U32'),
+                       ('ndim_problem', np.int64),
+                       ('index', np.int64),
+                       ('best_so_far_y', np.float64),
+                       ('n_function_evaluations', np.float64),
+                       ('runtime', np.float64),
+                       ('time_function_evaluations', np.float64),
+                       ('termination_signal', np.int64),
+                       ('offset', np.int64),
+                       ('length', np.int64)])
+
+
+def _align(handle, size):
+    """Truncate one (opened) file to a multiple of `size` bytes (i.e., to remove one partial record left by one
+        killed writer) and return its new size."""
+    n_bytes = handle.seek(0, os.SEEK_END)
+    if n_bytes % size != 0:
+        n_bytes -= n_bytes % size
+        handle.truncate(n_bytes)
+    return n_bytes
+
+
+class ResultsStore(object):
+    """Append-only columnar store of all runs of one sweep of experiments in one folder.
+
+        It consists of only three files: one table of metadata (`meta.bin`, one `META_DTYPE` record per run),
+        one array of all convergence curves (`curves.bin`, i.e., all `fitness` arrays of shape (`length`, 2)
+        concatenated as `float64` rows), and one lock file. Multiple processes (even on different hosts sharing
+        the same file system with `flock`) can append to it at the same time, since each run is appended under
+        one exclusive lock: first its curve and then its metadata record (which *commits* this run). Therefore,
+        a (killed) writer can leave at most one orphaned curve, which is never referred to.
+
+        Reading needs no lock: metadata of all committed runs is read in one call (and can be filtered by any
+        column), and all curves are memory-mapped, so that loading all curves of one function needs only one read
+        of the metadata rather than opening hundreds of (pickle) files.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        self._meta_file = os.path.join(self.folder, 'meta.bin')
+        self._curves_file = os.path.join(self.folder, 'curves.bin')
+        self._lock_file = os.path.join(self.folder, 'lock')
+
+    def append(self, optimizer, function, ndim_problem, index, results):
+        """Append the `results` (`dict`) of one run, where only its scalars and convergence curve are stored.
+
+        :param optimizer: name of the optimizer (`str`).
+        :param function: name of the test function (`str`).
+        :param ndim_problem: function dimensionality (`int`).
+        :param index: index of the experiment (`int`).
+        :param results: results returned by `optimize` of the optimizer (`dict`).
+        """
+        curve = results.get('fitness')
+        curve = np.empty((0, 2)) if curve is None else np.asarray(curve, dtype=np.float64).reshape(-1, 2)
+        record = np.zeros((1,), dtype=META_DTYPE)
+        record['optimizer'], record['function'] = optimizer, function
+        record['ndim_problem'], record['index'] = ndim_problem, index
+        for k in ['best_so_far_y', 'n_function_evaluations', 'runtime', 'time_function_evaluations',
+                  'termination_signal']:
+            record[k] = results.get(k, np.nan if k != 'termination_signal' else 0)
+        record['length'] = len(curve)
+        with open(self._lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # released when closed
+            with open(self._curves_file, 'ab') as handle:
+                record['offset'] = _align(handle, 2*8)//(2*8)  # in rows
+                handle.write(curve.tobytes())
+                handle.flush()
+                os.fsync(handle.fileno())
+            with open(self._meta_file, 'ab') as handle:  # to commit this run
+                _align(handle, META_DTYPE.itemsize)
+                handle.write(record.tobytes())
+                handle.flush()
+                os.fsync(handle.fileno())
+
+    def read(self, columns=None, **conditions):
+        """Read metadata of all (committed) runs satisfying all `conditions` (e.g., `function='sphere'`),
+            each of which is one column name and either one value or one list of values.
+
+        :param columns: names of columns to be returned (if `None`, all columns).
+        :return: one structured `ndarray` (one record per run, in order of appending).
+        """
+        if not os.path.exists(self._meta_file):
+            meta = np.empty((0,), dtype=META_DTYPE)
+        else:  # to ignore one (possibly) partial record being appended
+            n_records = os.path.getsize(self._meta_file)//META_DTYPE.itemsize
+            meta = np.fromfile(self._meta_file, dtype=META_DTYPE, count=n_records)
+        for k, v in conditions.items():
+            meta = meta[np.isin(meta[k], v)]
+        return meta if columns is None else meta[list(columns)]
+
+    def read_curves(self, meta):
+        """Read all convergence curves of the given runs (metadata returned by `read` with both columns
+            `offset` and `length`) via one memory map, each of which is one read-only `ndarray` of shape
+            (`length`, 2), i.e., (number of function evaluations, fitness) for each row.
+
+            Only all rows referred to by the given runs are mapped, so that one partial curve being appended (or
+            left by one killed writer) at the end of the file is ignored."""
+        if len(meta) == 0 or np.sum(meta['length']) == 0:
+            return [np.empty((0, 2)) for _ in range(len(meta))]
+        curves = np.memmap(self._curves_file, dtype=np.float64, mode='r',
+                           shape=(int(np.max(meta['offset'] + meta['length'])), 2))
+        return [curves[o:(o + n)] for o, n in zip(meta['offset'], meta['length'])]
+
+    def signature(self):
+        """Get one signature of all data stored so far, i.e., absolute path of the folder and modification time
+            and size of both data files (each `None` if not existing), which changes whenever any run is appended
+            (e.g., to be used as one key of caches computed from these data)."""
+        return [os.path.abspath(self.folder)] + [(os.path.getmtime(f), os.path.getsize(f)) if os.path.exists(f)
+                                                 else None for f in [self._meta_file, self._curves_file]]
+
+    def get_keys(self):
+        """Get keys (optimizer, function, ndim_problem, index) of all stored runs (e.g., to skip them)."""
+        meta = self.read(['optimizer', 'function', 'ndim_problem', 'index'])
+        return set((str(o), str(f), int(d), int(i)) for o, f, d, i in meta.tolist())
+
+
+def import_pickles(folder, store):
+    """Import all (one-pickle-per-run) results files `Algo-{}_Func-{}_Dim-{}_Exp-{}.pickle` under `folder`
+        (recursively) into the `store` (`ResultsStore`), skipping all runs already stored."""
+    from pypoplib import optimizer
+    sys.modules['optimizer'] = optimizer  # for `pickle`
+    pattern = re.compile(r'Algo-(\w+?)_Func-(\w+)_Dim-(\d+)_Exp-(\d+)\.pickle$')
+    keys, n_imported = store.get_keys(), 0
+    for file in sorted(glob.glob(os.path.join(folder, '**', 'Algo-*.pickle'), recursive=True)):
+        match = pattern.search(os.path.basename(file))
+        if match is None:
+            continue
+        key = match.group(1), match.group(2), int(match.group(3)), int(match.group(4))
+        if key not in keys:
+            with open(file, 'rb') as handle:
+                store.append(*key, pickle.load(handle))
+            keys.add(key)
+            n_imported += 1
+    return n_imported
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--store', type=str, default='pypop7_benchmarks_lso')  # folder of the results store
+    parser.add_argument('--import_from', type=str)  # folder of (one-pickle-per-run) results files to import
+    args = parser.parse_args()
+    results_store = ResultsStore(args.store)
+    if args.import_from is not None:
+        print('* {:d} runs imported.'.format(import_pickles(args.import_from, results_store)))
+    print('* {:d} runs stored.'.format(len(results_store.read())))
@@ -3,37 +3,56 @@ import numpy as np
 
 import pypoplib.base_functions as base_functions
 from pypoplib.base_functions import _squeeze_and_check
+from pypoplib.shifted_functions import _load_data
+from pypoplib.structured_rotations import rotate
 
 
 # helper functions
-def generate_rotation_matrix(func, ndim, seed):
+def generate_rotation_matrix(func, ndim, seed, method='qr'):
     """Generate a random rotation matrix of dimension [`ndim` * `ndim`], sampled normally.
 
-        Note that the generated rotation matrix will be automatically stored in txt form for further use.
+        Note that the generated rotation matrix will be automatically stored in both txt and (binary) npy form for
+        further use, where the npy form can be memory-mapped when loaded (much faster than parsing the txt form).
+
+        By default (`method='qr'`), the standard normal matrix is orthogonalized via the (blocked) QR decomposition
+        of LAPACK with sign correction, which gives a Haar-distributed orthogonal matrix. Mathematically it is the same
+        matrix as the one from the column-by-column Gram-Schmidt process, but it is computed orders of magnitude
+        faster. Set `method='gram_schmidt'` to reproduce the previously generated rotation matrices *bit-for-bit*.
 
     :param func: function name, a `str` or `function` object.
     :param ndim: number of dimensions of the rotation matrix, an `int` scalar.
     :param seed: seed for random number generator, a `int` scalar.
+    :param method: orthogonalization method, a `str` chosen from `'qr'` and `'gram_schmidt'`.
     :return: rotation matrix, a [`ndim` * `ndim`] ndarray.
     """
+    if method not in ['qr', 'gram_schmidt']:
+        raise TypeError(f"method should be 'qr' or 'gram_schmidt' (not {method}).")
     if hasattr(func, '__call__'):
         func = func.__name__
     data_folder = 'pypop_benchmarks_input_data'
     if not os.path.exists(data_folder):
         os.mkdir(data_folder)
-    data_path = os.path.join(data_folder, 'rotation_matrix_' + func + '_dim_' + str(ndim) + '.txt')
+    data_path = os.path.join(data_folder, 'rotation_matrix_' + func + '_dim_' + str(ndim))
     rotation_matrix = np.random.default_rng(seed).standard_normal(size=(ndim, ndim))
-    for i in range(ndim):
-        for j in range(i):
-            rotation_matrix[:, i] -= np.dot(rotation_matrix[:, i], rotation_matrix[:, j]) * rotation_matrix[:, j]
-        rotation_matrix[:, i] /= np.linalg.norm(rotation_matrix[:, i])
-    np.savetxt(data_path, rotation_matrix)
+    if method == 'qr':
+        rotation_matrix, r = np.linalg.qr(rotation_matrix)
+        # flip signs of columns such that diag(r) > 0 (otherwise it is NOT uniformly distributed)
+        rotation_matrix *= np.where(np.diag(r) < 0.0, -1.0, 1.0)
+    else:  # for compatibility with the previously generated rotation matrices
+        for i in range(ndim):
+            for j in range(i):
+                rotation_matrix[:, i] -= np.dot(rotation_matrix[:, i], rotation_matrix[:, j]) * rotation_matrix[:, j]
+            rotation_matrix[:, i] /= np.linalg.norm(rotation_matrix[:, i])
+    np.savetxt(data_path + '.txt', rotation_matrix)
+    np.save(data_path + '.npy', rotation_matrix)
     return rotation_matrix
 
 
 def _load_rotation_matrix(func, x, rotation_matrix=None):
     """Load the rotation matrix which needs to be generated in advance.
-        When `None`, the rotation matrix should have been generated and stored in txt form in advance.
+        When `None`, the rotation matrix should have been generated and stored in npy or txt form in advance.
+        The npy form (if available and not older than the txt form) is preferred and memory-mapped in read-only
+        mode, so that all processes on the same node share one page-cached copy of it.
 
     :param func: function name, a `function` object.
     :param x: decision vector, array_like of floats.
@@ -44,11 +63,8 @@ def _load_rotation_matrix(func, x, rotation_matrix=None):
     if rotation_matrix is None:
         if (not hasattr(func, 'pypop_rotation_matrix')) or (func.pypop_rotation_matrix.shape != (x.size, x.size)):
             data_folder = 'pypop_benchmarks_input_data'
-            data_path = os.path.join(data_folder, 'rotation_matrix_' + func.__name__ + '_dim_' + str(x.size) + '.txt')
-            rotation_matrix = np.loadtxt(data_path)
-            if rotation_matrix.size == 1:
-                rotation_matrix = np.array([[float(rotation_matrix)]])
-            func.pypop_rotation_matrix = rotation_matrix
+            data_path = os.path.join(data_folder, 'rotation_matrix_' + func.__name__ + '_dim_' + str(x.size))
+            func.pypop_rotation_matrix = _load_data(data_path, 2)
         rotation_matrix = func.pypop_rotation_matrix
     if rotation_matrix.shape != (x.size, x.size):
         raise TypeError(f'rotation matrix should have shape: {(x.size, x.size)}.')
@@ -57,59 +73,59 @@ def _load_rotation_matrix(func, x, rotation_matrix=None):
 
 def sphere(x, rotation_matrix=None):
     rotation_matrix = _load_rotation_matrix(sphere, x, rotation_matrix)
-    y = base_functions.sphere(np.dot(rotation_matrix, x))
+    y = base_functions.sphere(rotate(rotation_matrix, x))
     return y
 
 
 def cigar(x, rotation_matrix=None):
     rotation_matrix = _load_rotation_matrix(cigar, x, rotation_matrix)
-    y = base_functions.cigar(np.dot(rotation_matrix, x))
+    y = base_functions.cigar(rotate(rotation_matrix, x))
     return y
 
 
 def discus(x, rotation_matrix=None):  # also called tablet
     rotation_matrix = _load_rotation_matrix(discus, x, rotation_matrix)
-    y = base_functions.discus(np.dot(rotation_matrix, x))
+    y = base_functions.discus(rotate(rotation_matrix, x))
     return y
 
 
 def cigar_discus(x, rotation_matrix=None):
     rotation_matrix = _load_rotation_matrix(cigar_discus, x, rotation_matrix)
-    y = base_functions.cigar_discus(np.dot(rotation_matrix, x))
+    y = base_functions.cigar_discus(rotate(rotation_matrix, x))
     return y
 
 
 def ellipsoid(x, rotation_matrix=None):
     rotation_matrix = _load_rotation_matrix(ellipsoid, x, rotation_matrix)
-    y = base_functions.ellipsoid(np.dot(rotation_matrix, x))
+    y = base_functions.ellipsoid(rotate(rotation_matrix, x))
     return y
 
 
 def different_powers(x, rotation_matrix=None):
     rotation_matrix = _load_rotation_matrix(different_powers, x, rotation_matrix)
-    y = base_functions.different_powers(np.dot(rotation_matrix, x))
+    y = base_functions.different_powers(rotate(rotation_matrix, x))
     return y
 
 
 def schwefel221(x, rotation_matrix=None):
     rotation_matrix = _load_rotation_matrix(schwefel221, x, rotation_matrix)
-    y = base_functions.schwefel221(np.dot(rotation_matrix, x))
+    y = base_functions.schwefel221(rotate(rotation_matrix, x))
     return y
 
 
 def step(x, rotation_matrix=None):
     rotation_matrix = _load_rotation_matrix(step, x, rotation_matrix)
-    y = base_functions.step(np.dot(rotation_matrix, x))
+    y = base_functions.step(rotate(rotation_matrix, x))
     return y
 
 
 def rosenbrock(x, rotation_matrix=None):
     rotation_matrix = _load_rotation_matrix(rosenbrock, x, rotation_matrix)
-    y = base_functions.rosenbrock(np.dot(rotation_matrix, x))
+    y = base_functions.rosenbrock(rotate(rotation_matrix, x))
     return y
 
 
 def schwefel12(x, rotation_matrix=None):
     rotation_matrix = _load_rotation_matrix(schwefel12, x, rotation_matrix)
-    y = base_functions.schwefel12(np.dot(rotation_matrix, x))
+    y = base_functions.schwefel12(rotate(rotation_matrix, x))
     return y
@@ -0,0 +1,165 @@
+import os
+import re
+import glob
+import argparse
+
+import numpy as np
+
+
+# one record per (optimizer, function, index) experiment, stitched from all (possibly split) logs of one optimizer
+INDEX_DTYPE = np.dtype([('optimizer', 'U16'),
+                        ('function', 'U32'),
+                        ('index', np.int64),
+                        ('runtime', np.float64),  # `NaN` if not completed
+                        ('best_so_far_y', np.float64),  # `NaN` if not printed (e.g., by all old logs)
+                        ('n_worker_failures', np.int64),  # number of worker failures (crashes) during it
+                        ('is_completed', np.bool_),
+                        ('n_segments', np.int64)])  # number of log files in which it is found
+
+# file names of logs, e.g., `DLMCMA_1_1.out` or `DLMCMA_1_1-S1-E6.out` (i.e., one split run)
+_FILE = re.compile(r'^(.+)_(\d+)_(\d+)(-.*)?\.out$')
+# lines printed by `Experiments.run` (of both the old sequential version and the current scheduled version)
+_EXPERIMENT = re.compile(r'^\* experiment: (\d+) \*\*\*')
+_FUNCTION = re.compile(r'^  \* function: (\w+):')
+_RUNTIME = re.compile(r'^    runtime: (\S+?)\.?$')
+_PROGRESS = re.compile(r'\* \[\d+/\d+\] optimizer: (\w+), function: (\w+), index: (\d+), ' +
+                       r'(?:runtime: ([^,\s]+)(?:, best_so_far_y: (\S+))?|failed: (.*)) \(elapsed')
+# worker failures (e.g., of Ray) mixed into the stream of all logs, where one crash is (at most) one *report* of the
+#   dead worker (written to unbuffered stderr, so it often appears before the buffered stdout of the experiment
+#   crashed) plus one *error* raised in the driver (whose message also mentions the dead worker)
+_REPORT = re.compile(r'^(?!The actor is dead).*(?:A worker died or was killed|Worker unexpectedly exits)')
+_ERROR = re.compile(r'^(?:[\w.]+\.)?(?:RayActorError|BrokenProcessPool)\b')
+_WORKER_FAILURE = re.compile(r'RayActorError|BrokenProcessPool|A worker died or was killed|Worker unexpectedly exits')
+
+
+def _get_segment(file):
+    """Get the sort key of one log file, so that all split runs are stitched in order of their starting
+        functions (e.g., `-S5-E9` before `-S10-E10`)."""
+    start = re.search(r'-S(\d+)', os.path.basename(file))
+    return os.path.dirname(file), os.path.basename(file).split('-')[0], 0 if start is None else int(start.group(1))
+
+
+def parse_log(file):
+    """Parse one log file line by line (i.e., in constant memory regardless of its size) and yield one record
+        (optimizer, function, index, runtime, best_so_far_y, n_worker_failures, is_completed) per experiment.
+
+        One experiment started but not completed (e.g., interrupted by one crashed worker) is yielded with
+        `is_completed` = `False`. Since the report and the error of one crash can appear anywhere in the log
+        (see `_REPORT` and `_ERROR`), all crashes of one log (i.e., the maximum of the numbers of its reports and
+        errors) are charged to its last experiment not completed, which is yielded only at the end of the log;
+        if all its experiments are completed, they cannot be attributed and are not charged. For the progress
+        lines of the current `Experiments.run`, each failed experiment is charged with its own worker failure.
+    """
+    match = _FILE.match(os.path.basename(file))
+    optimizer = os.path.basename(os.path.dirname(file)) if match is None else match.group(1)
+    index, function = None, None  # `function` is being run if not `None`
+    incomplete, n_reports, n_errors = None, 0, 0  # the last experiment not completed (held until the end)
+    with open(file, 'r', errors='replace') as handle:
+        for line in handle:
+            match = _PROGRESS.search(line)
+            if match is not None:
+                runtime, y, error = match.group(4), match.group(5), match.group(6)
+                yield (match.group(1), match.group(2), int(match.group(3)),
+                       np.nan if runtime is None else float(runtime), np.nan if y is None else float(y),
+                       int(error is not None and _WORKER_FAILURE.search(error) is not None), runtime is not None)
+                continue
+            match = _EXPERIMENT.match(line) or _FUNCTION.match(line)
+            if match is not None:
+                if function is not None:  # the previous one was not completed
+                    if incomplete is not None:
+                        yield incomplete
+                    incomplete = optimizer, function, index, np.nan, np.nan, 0, False
+                if match.re is _EXPERIMENT:
+                    index, function = int(match.group(1)), None
+                else:
+                    function = match.group(1)
+                continue
+            match = _RUNTIME.match(line)
+            if match is not None and function is not None:
+                yield optimizer, function, index, float(match.group(1)), np.nan, 0, True
+                function = None
+                continue
+            n_reports += _REPORT.search(line) is not None
+            n_errors += _ERROR.search(line) is not None
+    if function is not None:
+        if incomplete is not None:
+            yield incomplete
+        incomplete = optimizer, function, index, np.nan, np.nan, 0, False
+    if incomplete is not None:
+        yield incomplete[:5] + (max(n_reports, n_errors), False)
+
+
+def build_index(folder='data', index_file=None):
+    """Build the index of all log files `{folder}/*/*.out`, where all split runs of each experiment are stitched
+        together: its completed record (the last one, if more) is kept and its worker-failure events are summed.
+
+    :param folder: folder of all logs, one subfolder per optimizer (`str`).
+    :param index_file: file to save the index to (`str`), if not `None`.
+    :return: one structured `ndarray` of `INDEX_DTYPE` (one record per experiment).
+    """
+    records = {}  # only one record per experiment (rather than per line) is kept in memory
+    for file in sorted(glob.glob(os.path.join(folder, '*', '*.out')), key=_get_segment):
+        for optimizer, function, index, runtime, y, n_failures, is_completed in parse_log(file):
+            key = optimizer, function, index
+            r = records.get(key)
+            if r is None:
+                records[key] = r = [runtime, y, 0, is_completed, 0]
+            elif is_completed or not r[3]:
+                r[0], r[1], r[3] = runtime, y, is_completed
+            r[2] += n_failures
+            r[4] += 1
+    index = np.empty((len(records),), dtype=INDEX_DTYPE)
+    for i, (key, r) in enumerate(sorted(records.items())):
+        index[i] = key + tuple(r)
+    if index_file is not None:
+        with open(index_file + '.tmp', 'wb') as handle:  # to save atomically
+            np.save(handle, index)
+        os.replace(index_file + '.tmp', index_file)
+    return index
+
+
+def is_stale(folder='data', index_file='data/index.npy'):
+    """Check whether the index file is missing or older than any log file (or any change of log files)."""
+    if not os.path.exists(index_file):
+        return True
+    files = [folder] + glob.glob(os.path.join(folder, '*', '')) + glob.glob(os.path.join(folder, '*', '*.out'))
+    return max(os.path.getmtime(f) for f in files) > os.path.getmtime(index_file)
+
+
+def read_index(folder='data', index_file='data/index.npy', columns=None, **conditions):
+    """Read all records of the index (which is rebuilt only if stale) satisfying all `conditions`
+        (e.g., `function='sphere'`), each of which is one column name and either one value or one list of values.
+
+    :param columns: names of columns to be returned (if `None`, all columns).
+    :return: one structured `ndarray` (one record per experiment).
+    """
+    if is_stale(folder, index_file):
+        index = build_index(folder, index_file)
+    else:
+        index = np.load(index_file)
+    for k, v in conditions.items():
+        index = index[np.isin(index[k], v)]
+    return index if columns is None else index[list(columns)]
+
+
+def get_final_runtime(index):
+    """Get the median runtime of all completed experiments for each (optimizer, function) of the index."""
+    index = index[index['is_completed']]
+    keys, inverse = np.unique(index[['optimizer', 'function']], return_inverse=True)
+    return {(str(o), str(f)): float(np.median(index['runtime'][inverse == i]))
+            for i, (o, f) in enumerate(keys.tolist())}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--folder', type=str, default='data')  # folder of all logs
+    parser.add_argument('--index_file', type=str, default='data/index.npy')  # file of the index
+    parser.add_argument('--optimizer', '-o', type=str)  # optimizer(s), separated by commas (default to all)
+    parser.add_argument('--function', '-f', type=str)  # function(s), separated by commas (default to all)
+    args = parser.parse_args()
+    conditions = {k: getattr(args, k).split(',') for k in ['optimizer', 'function'] if getattr(args, k)}
+    all_records = read_index(args.folder, args.index_file, **conditions)
+    print('* {:d} experiments indexed ({:d} not completed, {:d} with worker failures).'.format(
+        len(all_records), np.sum(~all_records['is_completed']), np.sum(all_records['n_worker_failures'] > 0)))
+    for (o, f), r in get_final_runtime(all_records).items():
+        print('  * optimizer: {:s}, function: {:s}, median runtime: {:7.5e}.'.format(o, f, r))
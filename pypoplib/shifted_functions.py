@@ -1,4 +1,6 @@
 import os
+import glob
+import warnings
 import numpy as np
 
 import pypoplib.base_functions as base_functions
@@ -10,7 +12,7 @@ def generate_shift_vector(func, ndim, low, high, seed=None):
     """Generate a random shift vector of dimension `ndim`, sampled uniformly between
         `low` (inclusive) and `high` (exclusive).
 
-    Note that the generated shift vector will be automatically stored in txt form for further use.
+    Note that the generated shift vector will be automatically stored in both txt and (binary) npy form for further use.
 
     :param func: function name, a `str` or `function` object.
     :param ndim: number of dimensions of the shift vector, an `int` scalar.
@@ -27,15 +29,62 @@ def generate_shift_vector(func, ndim, low, high, seed=None):
     data_folder = 'pypop_benchmarks_input_data'
     if not os.path.exists(data_folder):
         os.mkdir(data_folder)
-    data_path = os.path.join(data_folder, 'shift_vector_' + func + '_dim_' + str(ndim) + '.txt')
+    data_path = os.path.join(data_folder, 'shift_vector_' + func + '_dim_' + str(ndim))
     shift_vector = np.random.default_rng(seed).uniform(low, high, size=ndim)
-    np.savetxt(data_path, shift_vector)
+    np.savetxt(data_path + '.txt', shift_vector)
+    np.save(data_path + '.npy', shift_vector)
     return shift_vector
 
 
+def _is_npy_stale(data_path):
+    """Check whether the npy form of `data_path` is older than its txt form (e.g., after the txt form is edited or
+        copied from elsewhere), which therefore should not be used any more."""
+    return os.path.exists(data_path + '.txt') and (
+        os.path.getmtime(data_path + '.npy') < os.path.getmtime(data_path + '.txt'))
+
+
+def _load_data(data_path, ndmin):
+    """Load one shift vector or rotation matrix stored at `data_path` (without its extension) in npy or txt form.
+
+        The npy form (if available) is preferred and memory-mapped in read-only mode, *unless* it is older than
+        the txt form: then the txt form is loaded instead (with one warning), since the txt form is always
+        the source, from which the npy form can be regenerated via `convert_txt_to_npy`.
+    """
+    if os.path.exists(data_path + '.npy'):
+        if not _is_npy_stale(data_path):
+            return np.load(data_path + '.npy', mmap_mode='r')
+        warnings.warn(f'{data_path}.npy is older than {data_path}.txt and therefore ignored '
+                      '(please rerun `convert_txt_to_npy` to regenerate it).')
+    return np.loadtxt(data_path + '.txt', ndmin=ndmin)
+
+
+def convert_txt_to_npy(data_folder='pypop_benchmarks_input_data', overwrite=False):
+    """Convert all shift vectors and rotation matrices stored in txt form into (binary) npy form (only once).
+
+        The npy form is (re)generated if it does not exist or if it is older than the txt form.
+
+    :param data_folder: folder storing all shift vectors and rotation matrices, a `str`.
+    :param overwrite: whether or not to overwrite all the already existing npy files, a `bool`.
+    :return: paths of all converted npy files, a `list` of `str`.
+    """
+    converted = []
+    for prefix, ndmin in [('shift_vector_', 1), ('rotation_matrix_', 2)]:
+        for txt_path in sorted(glob.glob(os.path.join(data_folder, prefix + '*.txt'))):
+            data_path = os.path.splitext(txt_path)[0]
+            if overwrite or (not os.path.exists(data_path + '.npy')) or _is_npy_stale(data_path):
+                # to save atomically, since other processes may load it at the same time
+                with open(data_path + '.tmp.npy', 'wb') as handle:
+                    np.save(handle, np.loadtxt(txt_path, ndmin=ndmin))
+                os.replace(data_path + '.tmp.npy', data_path + '.npy')
+                converted.append(data_path + '.npy')
+    return converted
+
+
 def _load_shift_vector(func, x, shift_vector=None):
     """Load the shift vector which needs to be generated in advance.
-        When `None`, the shift vector should have been generated and stored in txt form in advance.
+        When `None`, the shift vector should have been generated and stored in npy or txt form in advance.
+        The npy form (if available and not older than the txt form) is preferred and memory-mapped in
+        read-only mode.
 
     :param func: function name, a `function` object.
     :param x: decision vector, array_like of floats.
@@ -46,9 +95,8 @@ def _load_shift_vector(func, x, shift_vector=None):
     if shift_vector is None:
         if (not hasattr(func, 'pypop_shift_vector')) or (func.pypop_shift_vector.size != x.size):
             data_folder = 'pypop_benchmarks_input_data'
-            data_path = os.path.join(data_folder, 'shift_vector_' + func.__name__ + '_dim_' + str(x.size) + '.txt')
-            shift_vector = np.loadtxt(data_path)
-            func.pypop_shift_vector = shift_vector
+            data_path = os.path.join(data_folder, 'shift_vector_' + func.__name__ + '_dim_' + str(x.size))
+            func.pypop_shift_vector = _load_data(data_path, 1)
         shift_vector = func.pypop_shift_vector
     shift_vector = _squeeze_and_check(shift_vector)
     if shift_vector.shape != x.shape:
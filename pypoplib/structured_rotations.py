@@ -0,0 +1,111 @@
+import numpy as np
+from scipy.fft import dct
+
+
+class StructuredRotation(object):
+    """Base (abstract) class of all *structured* rotations, which can be used in place of a dense rotation matrix.
+
+        Only the random seed (rather than any [`ndim` * `ndim`] matrix) is stored and transferred (e.g., via `pickle`
+        or `ray.put`), from which all its (at most linear-sized) parameters are regenerated deterministically.
+
+        For example, to use it for the rotated-shifted functions (e.g., `pypoplib.continuous_functions.sphere`):
+          `sphere.pypop_rotation_matrix = HouseholderRotation(ndim, seed)` or
+          `sphere(x, shift_vector, HouseholderRotation(ndim, seed))`.
+    """
+    def __init__(self, ndim, seed):
+        self.ndim = ndim  # number of dimensions
+        self.seed = seed  # seed for random number generator
+        self.shape = (ndim, ndim)  # same as the dense rotation matrix (for shape checking)
+
+    def _rotate(self, x):
+        raise NotImplementedError
+
+    def rotate(self, x):
+        """Rotate one decision vector (1-d) or each row of a population (2-d) of decision vectors.
+
+        :param x: decision vector(s), a 1-d or 2-d `ndarray` whose (last) dimension is `ndim`.
+        :return: rotated decision vector(s), a `ndarray` with the same shape as `x`.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        if x.shape[-1] != self.ndim:
+            raise TypeError(f'the last dimension of x should == {self.ndim} (not {x.shape[-1]}).')
+        return self._rotate(x)
+
+    def to_dense(self):
+        """Return the equivalent dense rotation matrix (only for checking on small dimensions)."""
+        return np.transpose(self.rotate(np.eye(self.ndim)))
+
+    def __reduce__(self):  # to only serialize the seed rather than all regenerated parameters
+        return self.__class__, (self.ndim, self.seed)
+
+
+class HouseholderRotation(StructuredRotation):
+    """Product of `n_reflectors` random Householder reflections, i.e., :math:`H_1 H_2 ... H_k`, where
+        each :math:`H_i = I - 2 u_i u_i^T` with one random unit vector :math:`u_i`.
+
+        Both the storage and the cost of each rotation are O(`ndim` * `n_reflectors`).
+    """
+    def __init__(self, ndim, seed, n_reflectors=None):
+        StructuredRotation.__init__(self, ndim, seed)
+        if n_reflectors is None:  # an even number for a *proper* rotation (determinant +1)
+            n_reflectors = min(2*int(np.ceil(np.log2(ndim + 1))), 2*int(np.ceil(ndim/2)))
+        assert n_reflectors > 0, f'`n_reflectors` = {n_reflectors}, but should > 0.'
+        self.n_reflectors = n_reflectors
+        u = np.random.default_rng(seed).standard_normal(size=(n_reflectors, ndim))
+        self._u = u/np.linalg.norm(u, axis=1, keepdims=True)  # unit vectors of all reflections
+
+    def _rotate(self, x):
+        x = np.array(x)
+        for u in self._u[::-1]:  # the last reflection is applied first
+            x -= 2.0*np.multiply.outer(np.dot(x, u), u)
+        return x
+
+    def __reduce__(self):
+        return self.__class__, (self.ndim, self.seed, self.n_reflectors)
+
+
+class DCTRotation(StructuredRotation):
+    """Randomized orthonormal discrete cosine transform (DCT), i.e., :math:`P C D`, where :math:`D` is a random
+        diagonal sign matrix, :math:`C` is the orthonormal DCT-II matrix, and :math:`P` is a random permutation.
+        The first sign of :math:`D` is flipped (if needed) such that its determinant is +1, i.e., it is a *proper*
+        rotation rather than a reflection, where :math:`det(C) = (-1)^{floor(ndim/2)}`.
+
+        The storage is O(`ndim`) and the cost of each rotation is O(`ndim` * log(`ndim`)).
+    """
+    def __init__(self, ndim, seed):
+        StructuredRotation.__init__(self, ndim, seed)
+        rng = np.random.default_rng(seed)
+        self._signs = rng.choice([-1.0, 1.0], size=(ndim,))
+        self._permutation = rng.permutation(ndim)
+        if (_get_parity(self._permutation) + ndim//2 + int(np.sum(self._signs < 0))) % 2 == 1:
+            self._signs[0] *= -1.0
+
+    def _rotate(self, x):
+        x = dct(self._signs*x, norm='ortho', axis=-1)
+        return x[..., self._permutation]
+
+
+def _get_parity(permutation):
+    """Get the parity (0 for even and 1 for odd) of one permutation via its cycle decomposition."""
+    is_visited, n_cycles = np.zeros((len(permutation),), dtype=bool), 0
+    for i in range(len(permutation)):
+        if not is_visited[i]:
+            n_cycles += 1
+            while not is_visited[i]:
+                is_visited[i], i = True, permutation[i]
+    return (len(permutation) - n_cycles) % 2
+
+
+def rotate(rotation_matrix, x):
+    """Rotate one decision vector (1-d) or each row of a population (2-d) via either a dense rotation matrix
+        or a structured rotation.
+
+    :param rotation_matrix: rotation matrix, a 2-d `ndarray` or a `StructuredRotation` object.
+    :param x: decision vector(s), a 1-d or 2-d `ndarray`.
+    :return: rotated decision vector(s), a `ndarray` with the same shape as `x`.
+    """
+    if isinstance(rotation_matrix, StructuredRotation):
+        return rotation_matrix.rotate(x)
+    if np.ndim(x) == 1:
+        return np.dot(rotation_matrix, x)
+    return np.dot(x, rotation_matrix.T)
@@ -1,12 +1,90 @@
 import os
 import time
-import pickle
+import fcntl
 import argparse
+import tempfile
+import importlib
+import multiprocessing
+import concurrent.futures
 
 import numpy as np  # for numerical computing
-import pypop7  # for all benchmarking optimizers
 
 import pypoplib.continuous_functions as cf  # for rotated and shifted benchmarking functions
+from pypoplib.results_store import ResultsStore  # for saving all results of one sweep in one columnar store
+# to close *multi-thread* of all numerical libraries for each (single-threaded) worker process
+from pypoplib.backends import _SINGLE_THREAD_ENV_VARS, _updated_environ
+
+
+# to map the name of each optimizer (class) to its module, which is imported *lazily* only when used
+OPTIMIZERS = {
+    'PRS': 'pypop7.optimizers.rs.prs',
+    'RHC': 'pypop7.optimizers.rs.rhc',
+    'ARHC': 'pypop7.optimizers.rs.arhc',
+    'SRS': 'pypop7.optimizers.rs.srs',
+    'BES': 'pypop7.optimizers.rs.bes',
+    'GENITOR': 'pypop7.optimizers.ga.genitor',
+    'G3PCX': 'pypop7.optimizers.ga.g3pcx',
+    'GL25': 'pypop7.optimizers.ga.gl25',
+    'CSA': 'pypop7.optimizers.sa.csa',
+    'ESA': 'pypop7.optimizers.sa.esa.esa',
+    'NSA': 'pypop7.optimizers.sa.nsa',
+    'COEA': 'pypop7.optimizers.cc.coea',
+    'COSYNE': 'pypop7.optimizers.cc.cosyne',
+    'COCMA': 'pypop7.optimizers.cc.cocma',
+    'HCC': 'pypop7.optimizers.cc.hcc',
+    'SPSO': 'pypop7.optimizers.pso.spso',
+    'SPSOL': 'pypop7.optimizers.pso.spsol',
+    'CPSO': 'pypop7.optimizers.pso.cpso',
+    'CLPSO': 'pypop7.optimizers.pso.clpso',
+    'CCPSO2': 'pypop7.optimizers.pso.ccpso2',
+    'CDE': 'pypop7.optimizers.de.cde',
+    'TDE': 'pypop7.optimizers.de.tde',
+    'JADE': 'pypop7.optimizers.de.jade',
+    'CODE': 'pypop7.optimizers.de.code',
+    'SCEM': 'pypop7.optimizers.cem.scem',
+    'DSCEM': 'pypop7.optimizers.cem.dscem',
+    'MRAS': 'pypop7.optimizers.cem.mras',
+    'DCEM': 'pypop7.optimizers.cem.dcem',
+    'UMDA': 'pypop7.optimizers.eda.umda',
+    'EMNA': 'pypop7.optimizers.eda.emna',
+    'AEMNA': 'pypop7.optimizers.eda.aemna',
+    'RPEDA': 'pypop7.optimizers.eda.rpeda',
+    'SGES': 'pypop7.optimizers.nes.sges',
+    'XNES': 'pypop7.optimizers.nes.xnes',
+    'SNES': 'pypop7.optimizers.nes.snes',
+    'R1NES': 'pypop7.optimizers.nes.r1nes',
+    'DLMCMA': 'pypoplib.dlmcma',  # Distributed
+    'MMES': 'pypop7.optimizers.es.mmes',  # 2021
+    'SAMAES': 'pypop7.optimizers.es.samaes',  # 2020
+    'SAES': 'pypop7.optimizers.es.saes',  # 2020
+    'DDCMA': 'pypop7.optimizers.es.ddcma',  # 2020
+    'FCMAES': 'pypop7.optimizers.es.fcmaes',  # 2020
+    'LMMAES': 'pypop7.optimizers.es.lmmaes',  # 2019
+    'RMES': 'pypop7.optimizers.es.rmes',  # 2018
+    'R1ES': 'pypop7.optimizers.es.r1es',  # 2018
+    'FMAES': 'pypop7.optimizers.es.fmaes',  # 2017
+    'MAES': 'pypop7.optimizers.es.maes',  # 2017
+    'LMCMA': 'pypop7.optimizers.es.lmcma',  # 2017
+    'CCMAES2016': 'pypop7.optimizers.es.ccmaes2016',# 2016
+    'VKDCMA': 'pypop7.optimizers.es.vkdcma',  # 2016
+    'CMAES': 'pypop7.optimizers.es.cmaes',  # 2016
+    'OPOA2015': 'pypop7.optimizers.es.opoa2015',  # 2015
+    'LMCMAES': 'pypop7.optimizers.es.lmcmaes',  # 2014
+    'VDCMA': 'pypop7.optimizers.es.vdcma',  # 2014
+    'OPOA2010': 'pypop7.optimizers.es.opoa2010',  # 2010
+    'CCMAES2009': 'pypop7.optimizers.es.ccmaes2009',# 2009
+    'OPOC2009': 'pypop7.optimizers.es.opoc2009',  # 2009
+    'SEPCMAES': 'pypop7.optimizers.es.sepcmaes',  # 2008
+    'OPOC2006': 'pypop7.optimizers.es.opoc2006',  # 2006
+    'CSAES': 'pypop7.optimizers.es.csaes',  # 1994
+    'DSAES': 'pypop7.optimizers.es.dsaes',  # 1994
+    'RES': 'pypop7.optimizers.es.res',  # 1973
+}
+
+
+def get_optimizer(name):
+    """Import (lazily) and return the optimizer class registered under `name`."""
+    return getattr(importlib.import_module(OPTIMIZERS[name]), name)
 
 
 class Experiment(object):
@@ -21,11 +99,11 @@ class Experiment(object):
         self.function = function  # test function of each experiment
         self.seed = seed  # random seed of each experiment
         self.ndim_problem = ndim_problem  # function dimensionality
-        self._folder = 'pypop7_benchmarks_lso'  # folder to save all data
-        if not os.path.exists(self._folder):
-            os.makedirs(self._folder)
-        # to set file name for each experiment
-        self._file = os.path.join(self._folder, 'Algo-{}_Func-{}_Dim-{}_Exp-{}.pickle')
+        self._folder = 'pypop7_benchmarks_lso'  # folder to save all data (in one results store for all experiments)
+
+    def get_key(self, optimizer):
+        """Get the key of results of this experiment for the given optimizer (name) in the results store."""
+        return optimizer, self.function.__name__, self.ndim_problem, self.index
 
     def run(self, optimizer):
         # first to define all the necessary properties of the function to be minimized
@@ -45,12 +123,37 @@ class Experiment(object):
         options['n_inner_es'] = 380  # only for our meta-framework on unimodal functions (number of parallel inner-ESs)
         solver = optimizer(problem, options)  # to initialize the optimizer
         results = solver.optimize()  # to run the optimization/evolution process
-        file = self._file.format(solver.__class__.__name__,
-                                 solver.fitness_function.__name__,
-                                 solver.ndim_problem,
-                                 self.index)
-        with open(file, 'wb') as handle:  # to save all data in .pickle format
-            pickle.dump(results, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        # to append only all scalars and the (compressed) convergence curve to the results store
+        ResultsStore(self._folder).append(solver.__class__.__name__, solver.fitness_function.__name__,
+                                          solver.ndim_problem, self.index, results)
+        return results
+
+
+def _acquire_host_slot(max_per_host):
+    """Acquire one of `max_per_host` slots shared by all processes (even of different runs) on the same host,
+        via exclusive locks of files, and return the locked file (the slot is released when it is closed)."""
+    while True:
+        for i in range(max_per_host):
+            handle = open(os.path.join(tempfile.gettempdir(), 'pypop7_benchmarks_slot_{:d}.lock'.format(i)), 'w')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return handle
+            except BlockingIOError:  # this slot is being used
+                handle.close()
+        time.sleep(1.0)
+
+
+def _run_experiment(experiment, optimizer, max_per_host=None):
+    """Run one experiment with the given optimizer (name) and return its runtime and best-so-far fitness, where
+        the optimizer is imported only in the (worker) process running it."""
+    slot = None if max_per_host is None else _acquire_host_slot(max_per_host)
+    try:
+        start_time = time.time()
+        results = experiment.run(get_optimizer(optimizer))
+        return time.time() - start_time, results['best_so_far_y']
+    finally:
+        if slot is not None:
+            slot.close()
 
 
 class Experiments(object):
@@ -65,15 +168,61 @@ class Experiments(object):
         self.seeds = np.random.default_rng(2022).integers(  # to generate all random seeds in advances
             np.iinfo(np.int64).max, size=(len(self.functions), 50))
 
-    def run(self, optimizer):
-        for index in self.indices:
-            print('* experiment: {:d} ***:'.format(index))
-            for d, f in enumerate(self.functions):
-                start_time = time.time()
-                print('  * function: {:s}:'.format(f.__name__))
-                experiment = Experiment(index, f, self.seeds[d, index], self.ndim_problem)
-                experiment.run(optimizer)
-                print('    runtime: {:7.5e}.'.format(time.time() - start_time))
+    def get_tasks(self, optimizers):
+        """Expand all settings (optimizer, function, index, dimension) into one queue of experiments, where
+            experiments whose results already exist (in the results store) are skipped."""
+        tasks, keys = [], None
+        for optimizer in optimizers:
+            for index in self.indices:
+                for d, f in enumerate(self.functions):
+                    experiment = Experiment(index, f, self.seeds[d, index], self.ndim_problem)
+                    if keys is None:  # to read all keys only once
+                        keys = ResultsStore(experiment._folder).get_keys()
+                    if experiment.get_key(optimizer) not in keys:
+                        tasks.append((experiment, optimizer))
+        return tasks
+
+    def run(self, optimizers, n_workers=1, max_per_host=None, log=None):
+        """Run all experiments of all `optimizers` (names) not finished yet.
+
+            If `n_workers` > 1, they are run on one pool of (spawned) worker processes, each of which is pinned to
+            one BLAS thread; otherwise, they are run one by one in the current process (e.g., for distributed
+            optimizers). At most `max_per_host` experiments (of all runs) are run at the same time on each host.
+            Progress and ETA are printed (and appended to the `log` file) after each experiment.
+        """
+        tasks, start_time = self.get_tasks(optimizers), time.time()
+        print('* {:d} experiments to run ({:d} skipped):'.format(
+            len(tasks), len(optimizers)*len(self.indices)*len(self.functions) - len(tasks)))
+
+        def report(n_done, experiment, optimizer, info):
+            elapsed = time.time() - start_time
+            eta = elapsed/n_done*(len(tasks) - n_done)  # according to the throughput so far
+            line = ('  * [{:d}/{:d}] optimizer: {:s}, function: {:s}, index: {:d}, {:s} ' +
+                    '(elapsed: {:7.5e}, ETA: {:7.5e}).').format(n_done, len(tasks), optimizer,
+                experiment.function.__name__, experiment.index, info, elapsed, eta)
+            print(line, flush=True)
+            if log is not None:
+                with open(log, 'a') as handle:
+                    handle.write(time.strftime('%Y-%m-%d %H:%M:%S ') + line + '\n')
+
+        if n_workers == 1:
+            for n_done, (experiment, optimizer) in enumerate(tasks, 1):
+                info = 'runtime: {:7.5e}, best_so_far_y: {:7.5e}'.format(
+                    *_run_experiment(experiment, optimizer, max_per_host))
+                report(n_done, experiment, optimizer, info)
+            return
+        # which are read by each spawned worker process at start
+        with _updated_environ(_SINGLE_THREAD_ENV_VARS):
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=n_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                futures = {executor.submit(_run_experiment, experiment, optimizer, max_per_host): (
+                    experiment, optimizer) for experiment, optimizer in tasks}
+                for n_done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                    try:
+                        info = 'runtime: {:7.5e}, best_so_far_y: {:7.5e}'.format(*future.result())
+                    except Exception as e:  # not to stop all others (it will be rerun next time)
+                        info = 'failed: {!r}'.format(e)
+                    report(n_done, *futures[future], info)
 
 
 if __name__ == '__main__':
@@ -81,134 +230,22 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--start', '-s', type=int)  # starting index
     parser.add_argument('--end', '-e', type=int)  # ending index
-    parser.add_argument('--optimizer', '-o', type=str)  # optimizer
+    parser.add_argument('--optimizer', '-o', type=str)  # optimizer(s), separated by commas (e.g., A,B,C)
+    parser.add_argument('--list', action='store_true')  # to list all optimizers (and exit)
     parser.add_argument('--ndim_problem', '-d', type=int, default=2000)  # dimension (default to 2000)
+    parser.add_argument('--n_workers', '-n', type=int, default=1)  # number of worker processes (default to 1)
+    parser.add_argument('--max_per_host', type=int)  # maximal number of experiments on each host (of all runs)
+    parser.add_argument('--log', type=str)  # file to append progress to
     args = parser.parse_args()
     params = vars(args)
-    if params['optimizer'] == 'PRS':
-        from pypop7.optimizers.rs.prs import PRS as Optimizer
-    elif params['optimizer'] == 'RHC':
-        from pypop7.optimizers.rs.rhc import RHC as Optimizer
-    elif params['optimizer'] == 'ARHC':
-        from pypop7.optimizers.rs.arhc import ARHC as Optimizer
-    elif params['optimizer'] == 'SRS':
-        from pypop7.optimizers.rs.srs import SRS as Optimizer
-    elif params['optimizer'] == 'BES':
-        from pypop7.optimizers.rs.bes import BES as Optimizer
-    elif params['optimizer'] == 'GENITOR':
-        from pypop7.optimizers.ga.genitor import GENITOR as Optimizer
-    elif params['optimizer'] == 'G3PCX':
-        from pypop7.optimizers.ga.g3pcx import G3PCX as Optimizer
-    elif params['optimizer'] == 'GL25':
-        from pypop7.optimizers.ga.gl25 import GL25 as Optimizer
-    elif params['optimizer'] == 'CSA':
-        from pypop7.optimizers.sa.csa import CSA as Optimizer
-    elif params['optimizer'] == 'ESA':
-        from pypop7.optimizers.sa.esa.esa import ESA as Optimizer
-    elif params['optimizer'] == 'NSA':
-        from pypop7.optimizers.sa.nsa import NSA as Optimizer
-    elif params['optimizer'] == 'COEA':
-        from pypop7.optimizers.cc.coea import COEA as Optimizer
-    elif params['optimizer'] == 'COSYNE':
-        from pypop7.optimizers.cc.cosyne import COSYNE as Optimizer
-    elif params['optimizer'] == 'COCMA':
-        from pypop7.optimizers.cc.cocma import COCMA as Optimizer
-    elif params['optimizer'] == 'HCC':
-        from pypop7.optimizers.cc.hcc import HCC as Optimizer
-    elif params['optimizer'] == 'SPSO':
-        from pypop7.optimizers.pso.spso import SPSO as Optimizer
-    elif params['optimizer'] == 'SPSOL':
-        from pypop7.optimizers.pso.spsol import SPSOL as Optimizer
-    elif params['optimizer'] == 'CPSO':
-        from pypop7.optimizers.pso.cpso import CPSO as Optimizer
-    elif params['optimizer'] == 'CLPSO':
-        from pypop7.optimizers.pso.clpso import CLPSO as Optimizer
-    elif params['optimizer'] == 'CCPSO2':
-        from pypop7.optimizers.pso.ccpso2 import CCPSO2 as Optimizer
-    elif params['optimizer'] == 'CDE':
-        from pypop7.optimizers.de.cde import CDE as Optimizer
-    elif params['optimizer'] == 'TDE':
-        from pypop7.optimizers.de.tde import TDE as Optimizer
-    elif params['optimizer'] == 'JADE':
-        from pypop7.optimizers.de.jade import JADE as Optimizer
-    elif params['optimizer'] == 'CODE':
-        from pypop7.optimizers.de.code import CODE as Optimizer
-    elif params['optimizer'] == 'SCEM':
-        from pypop7.optimizers.cem.scem import SCEM as Optimizer
-    elif params['optimizer'] == 'DSCEM':
-        from pypop7.optimizers.cem.dscem import DSCEM as Optimizer
-    elif params['optimizer'] == 'MRAS':
-        from pypop7.optimizers.cem.mras import MRAS as Optimizer
-    elif params['optimizer'] == 'DCEM':
-        from pypop7.optimizers.cem.dcem import DCEM as Optimizer
-    elif params['optimizer'] == 'UMDA':
-        from pypop7.optimizers.eda.umda import UMDA as Optimizer
-    elif params['optimizer'] == 'EMNA':
-        from pypop7.optimizers.eda.emna import EMNA as Optimizer
-    elif params['optimizer'] == 'AEMNA':
-        from pypop7.optimizers.eda.aemna import AEMNA as Optimizer
-    elif params['optimizer'] == 'RPEDA':
-        from pypop7.optimizers.eda.rpeda import RPEDA as Optimizer
-    elif params['optimizer'] == 'SGES':
-        from pypop7.optimizers.nes.sges import SGES as Optimizer
-    elif params['optimizer'] == 'XNES':
-        from pypop7.optimizers.nes.xnes import XNES as Optimizer
-    elif params['optimizer'] == 'SNES':
-        from pypop7.optimizers.nes.snes import SNES as Optimizer
-    elif params['optimizer'] == 'R1NES':
-        from pypop7.optimizers.nes.r1nes import R1NES as Optimizer
-    elif params['optimizer'] == 'DLMCMA':  # Distributed
-        from pypoplib.dlmcma import DLMCMA as Optimizer
-    elif params['optimizer'] == 'MMES':  # 2021
-        from pypop7.optimizers.es.mmes import MMES as Optimizer
-    elif params['optimizer'] == 'SAMAES':  # 2020
-        from pypop7.optimizers.es.samaes import SAMAES as Optimizer
-    elif params['optimizer'] == 'SAES':  # 2020
-        from pypop7.optimizers.es.saes import SAES as Optimizer
-    elif params['optimizer'] == 'DDCMA':  # 2020
-        from pypop7.optimizers.es.ddcma import DDCMA as Optimizer
-    elif params['optimizer'] == 'FCMAES':  # 2020
-        from pypop7.optimizers.es.fcmaes import FCMAES as Optimizer
-    elif params['optimizer'] == 'LMMAES':  # 2019
-        from pypop7.optimizers.es.lmmaes import LMMAES as Optimizer
-    elif params['optimizer'] == 'RMES':  # 2018
-        from pypop7.optimizers.es.rmes import RMES as Optimizer
-    elif params['optimizer'] == 'R1ES':  # 2018
-        from pypop7.optimizers.es.r1es import R1ES as Optimizer
-    elif params['optimizer'] == 'FMAES':  # 2017
-        from pypop7.optimizers.es.fmaes import FMAES as Optimizer
-    elif params['optimizer'] == 'MAES':  # 2017
-        from pypop7.optimizers.es.maes import MAES as Optimizer
-    elif params['optimizer'] == 'LMCMA':  # 2017
-        from pypop7.optimizers.es.lmcma import LMCMA as Optimizer
-    elif params['optimizer'] == 'CCMAES2016':  # 2016
-        from pypop7.optimizers.es.ccmaes2016 import CCMAES2016 as Optimizer
-    elif params['optimizer'] == 'VKDCMA':  # 2016
-        from pypop7.optimizers.es.vkdcma import VKDCMA as Optimizer
-    elif params['optimizer'] == 'CMAES':  # 2016
-        from pypop7.optimizers.es.cmaes import CMAES as Optimizer
-    elif params['optimizer'] == 'OPOA2015':  # 2015
-        from pypop7.optimizers.es.opoa2015 import OPOA2015 as Optimizer
-    elif params['optimizer'] == 'LMCMAES':  # 2014
-        from pypop7.optimizers.es.lmcmaes import LMCMAES as Optimizer
-    elif params['optimizer'] == 'VDCMA':  # 2014
-        from pypop7.optimizers.es.vdcma import VDCMA as Optimizer
-    elif params['optimizer'] == 'OPOA2010':  # 2010
-        from pypop7.optimizers.es.opoa2010 import OPOA2010 as Optimizer
-    elif params['optimizer'] == 'CCMAES2009':  # 2009
-        from pypop7.optimizers.es.ccmaes2009 import CCMAES2009 as Optimizer
-    elif params['optimizer'] == 'OPOC2009':  # 2009
-        from pypop7.optimizers.es.opoc2009 import OPOC2009 as Optimizer
-    elif params['optimizer'] == 'SEPCMAES':  # 2008
-        from pypop7.optimizers.es.sepcmaes import SEPCMAES as Optimizer
-    elif params['optimizer'] == 'OPOC2006':  # 2006
-        from pypop7.optimizers.es.opoc2006 import OPOC2006 as Optimizer
-    elif params['optimizer'] == 'CSAES':  # 1994
-        from pypop7.optimizers.es.csaes import CSAES as Optimizer
-    elif params['optimizer'] == 'DSAES':  # 1994
-        from pypop7.optimizers.es.dsaes import DSAES as Optimizer
-    elif params['optimizer'] == 'RES':  # 1973
-        from pypop7.optimizers.es.res import RES as Optimizer
+    if params['list']:
+        parser.exit(message=''.join('{:s} ({:s})\n'.format(k, v) for k, v in OPTIMIZERS.items()))
+    if params['optimizer'] is None:
+        parser.error('the following argument is required: --optimizer/-o (see --list for all).')
+    optimizers = params['optimizer'].split(',')
+    unknown = [o for o in optimizers if o not in OPTIMIZERS]
+    if len(unknown) > 0:  # to fail early (rather than after importing or running)
+        parser.error('unknown optimizer(s): {:s} (see --list for all).'.format(','.join(unknown)))
     experiments = Experiments(params['start'], params['end'], params['ndim_problem'])
-    experiments.run(Optimizer)
+    experiments.run(optimizers, params['n_workers'], params['max_per_host'], params['log'])
     print('*** Total runtime: {:7.5e} ***.'.format(time.time() - start_runtime))
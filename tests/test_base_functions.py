@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import pypoplib.base_functions as bf
+
+
+# baseline (loop/list) implementations, without the input checks (to be compared also for one dimension)
+def _ellipsoid(x):
+    return np.dot(np.power(10, 6 * np.linspace(0, 1, x.size)), np.power(x, 2))
+
+
+def _different_powers(x):
+    return np.sum(np.power(np.abs(x), 2 + 4 * np.linspace(0, 1, x.size)))
+
+
+def _schwefel12(x):
+    return np.sum(np.power([np.sum(x[:i + 1]) for i in range(x.size)], 2))
+
+
+_FUNCTIONS = [(bf.ellipsoid, bf.ellipsoid_batch, bf._ellipsoid, _ellipsoid),
+              (bf.different_powers, bf.different_powers_batch, bf._different_powers, _different_powers),
+              (bf.schwefel12, bf.schwefel12_batch, bf._schwefel12, _schwefel12)]
+_RTOL = 1e-12  # not bit-for-bit, since the summation order differs (about 3e-15 in practice)
+_BATCH_FUNCTIONS = sorted(name for name in dir(bf) if name.endswith('_batch'))  # all exported batch functions
+
+
+@pytest.mark.parametrize('function, function_batch, kernel, baseline', _FUNCTIONS)
+def test_parity(function, function_batch, kernel, baseline):
+    rng = np.random.default_rng(2022)
+    for ndim in [1, 2, 3, 10, 100, 1000]:
+        x = 10.0*rng.standard_normal(size=(5, ndim))
+        y = [baseline(xx) for xx in x]
+        np.testing.assert_allclose([kernel(xx) for xx in x], y, rtol=_RTOL)
+        np.testing.assert_allclose(kernel(x), y, rtol=_RTOL)
+        if ndim > 1:
+            np.testing.assert_allclose([function(xx) for xx in x], y, rtol=_RTOL)
+            np.testing.assert_allclose(function_batch(x), y, rtol=_RTOL)
+        else:  # as the baseline, one dimension is not allowed
+            with pytest.raises(TypeError):
+                function(x[0])
+            with pytest.raises(TypeError):
+                function_batch(x)
+
+
+def test_cached_coefficients():
+    for ndim in [1, 2, 3, 10, 100, 1000]:
+        w, e = bf._ellipsoid_weights(ndim), bf._different_powers_exponents(ndim)
+        assert np.array_equal(w, np.power(10, 6 * np.linspace(0, 1, ndim)))
+        assert np.array_equal(e, 2 + 4 * np.linspace(0, 1, ndim))
+        assert not (w.flags.writeable or e.flags.writeable)  # shared by all calls
+        assert bf._ellipsoid_weights(ndim) is w and bf._different_powers_exponents(ndim) is e
+
+
+@pytest.mark.parametrize('name', _BATCH_FUNCTIONS)
+def test_batch_parity(name):  # each batch function against its function evaluated row by row
+    rng = np.random.default_rng(2022)
+    function, function_batch = getattr(bf, name[:-len('_batch')]), getattr(bf, name)
+    for ndim in [2, 3, 10, 100, 1000]:
+        x = 10.0*rng.standard_normal(size=(5, ndim))
+        y = function_batch(x)
+        assert y.shape == (5,)
+        np.testing.assert_allclose(y, [function(xx) for xx in x], rtol=_RTOL)
+        np.testing.assert_allclose(function_batch(x[:1]), [function(x[0])], rtol=_RTOL)
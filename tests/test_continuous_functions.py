@@ -0,0 +1,98 @@
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pytest
+
+import pypoplib.base_functions as bf
+import pypoplib.continuous_functions as cf
+from pypoplib.shifted_functions import generate_shift_vector
+from pypoplib.rotated_functions import generate_rotation_matrix
+from pypoplib.structured_rotations import DCTRotation, rotate
+
+
+_FUNCTIONS = [cf.sphere, cf.cigar, cf.discus, cf.cigar_discus, cf.ellipsoid, cf.different_powers, cf.schwefel221,
+              cf.step, cf.rosenbrock, cf.schwefel12]
+_NDIM = 10
+_BATCH_FUNCTIONS = sorted(name for name in dir(cf) if name.endswith('_batch'))  # all exported batch functions
+
+
+@pytest.fixture
+def data(tmp_path, monkeypatch):  # shift vectors and rotation matrices of all functions (in the working directory)
+    monkeypatch.chdir(tmp_path)
+    for i, func in enumerate(_FUNCTIONS):
+        generate_shift_vector(func, _NDIM, -9.5, 9.5, i)
+        generate_rotation_matrix(func, _NDIM, i)
+        for k in ['pypop_shift_vector', 'pypop_rotation_matrix']:  # not to reuse data loaded by other tests
+            if hasattr(func, k):
+                delattr(func, k)
+
+
+def _get_population(n=7):
+    return 5.0*np.random.default_rng(n).standard_normal((n, _NDIM))
+
+
+@pytest.mark.parametrize('func', _FUNCTIONS)
+def test_bound_function(data, func):
+    x = _get_population()
+    for rotation_matrix in [None, DCTRotation(_NDIM, 1)]:  # loaded (dense) or given (structured)
+        bound = cf.BoundFunction(func, _NDIM, rotation_matrix=rotation_matrix)
+        shift_vector, rotation_matrix = cf.load_shift_and_rotation(func, x[0], None, rotation_matrix)
+        # to shift and rotate and then evaluate (by the base function), one by one and all at once
+        y = [getattr(bf, func.__name__)(rotate(rotation_matrix, xx - shift_vector)) for xx in x]
+        np.testing.assert_allclose([bound(xx) for xx in x], y, rtol=1e-12)
+        np.testing.assert_allclose([func(xx, shift_vector, rotation_matrix) for xx in x], y, rtol=1e-12)
+        np.testing.assert_allclose(bound.batch(x), y, rtol=1e-12)
+        np.testing.assert_allclose(bound.batch(x[:1]), y[:1], rtol=1e-12)
+        bound_pickled = pickle.loads(pickle.dumps(bound))  # as sent to all workers of backends
+        assert bound_pickled.__name__ == func.__name__ and bound_pickled.ndim_problem == _NDIM
+        assert np.array_equal(bound_pickled.shift_vector, bound.shift_vector)
+        assert np.array_equal(bound_pickled.batch(x), bound.batch(x))
+        assert all(bound_pickled(xx) == bound(xx) for xx in x)
+
+
+@pytest.mark.parametrize('name', _BATCH_FUNCTIONS)
+def test_batch_parity(data, name):  # each batch function against its function evaluated row by row
+    function, function_batch = getattr(cf, name[:-len('_batch')]), getattr(cf, name)
+    x = _get_population()
+    rng = np.random.default_rng(1)
+    for shift_vector, rotation_matrix in [(None, None),  # loaded from files
+                                          (rng.uniform(-9.5, 9.5, _NDIM), np.linalg.qr(rng.standard_normal(
+                                              (_NDIM, _NDIM)))[0]),  # given (dense)
+                                          (np.zeros((_NDIM,)), DCTRotation(_NDIM, 2))]:  # given (structured)
+        y = function_batch(x, shift_vector, rotation_matrix)
+        assert y.shape == (len(x),)
+        np.testing.assert_allclose(y, [function(xx, shift_vector, rotation_matrix) for xx in x], rtol=1e-12)
+        np.testing.assert_allclose(function_batch(x[:1], shift_vector, rotation_matrix),
+                                   [function(x[0], shift_vector, rotation_matrix)], rtol=1e-12)
+
+
+def test_bound_function_checks(data):
+    with pytest.raises(TypeError):  # without any base function
+        cf.BoundFunction(cf.shift_and_rotate_population, _NDIM)
+    with pytest.raises(TypeError):  # with one wrong shape of the rotation matrix
+        cf.BoundFunction(cf.sphere, _NDIM, rotation_matrix=np.eye(_NDIM + 1))
+
+
+def test_load_stale_npy(data):
+    data_path = os.path.join('pypop_benchmarks_input_data', 'shift_vector_sphere_dim_' + str(_NDIM))
+    shift_vector = np.loadtxt(data_path + '.txt')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')  # no warning when the npy form is up to date
+        assert isinstance(cf.load_shift_and_rotation(cf.sphere, np.zeros((_NDIM,)))[0], np.memmap)
+    np.savetxt(data_path + '.txt', shift_vector + 1.0)  # to edit only the txt form (e.g., by hand)
+    t = os.path.getmtime(data_path + '.txt') - 10.0
+    os.utime(data_path + '.npy', (t, t))  # not to rely on the resolution of modification times
+    del cf.sphere.pypop_shift_vector, cf.sphere.pypop_rotation_matrix
+    with pytest.warns(UserWarning, match='older'):  # not to silently use the stale npy form
+        np.testing.assert_allclose(cf.load_shift_and_rotation(cf.sphere, np.zeros((_NDIM,)))[0], shift_vector + 1.0)
+    assert cf.convert_txt_to_npy() == [data_path + '.npy']  # to regenerate only the stale one
+    assert cf.convert_txt_to_npy() == []
+    del cf.sphere.pypop_shift_vector, cf.sphere.pypop_rotation_matrix
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        shift_vector_npy = cf.load_shift_and_rotation(cf.sphere, np.zeros((_NDIM,)))[0]
+    assert isinstance(shift_vector_npy, np.memmap)
+    np.testing.assert_allclose(shift_vector_npy, shift_vector + 1.0)
+    assert len(cf.convert_txt_to_npy(overwrite=True)) == 2*len(_FUNCTIONS)
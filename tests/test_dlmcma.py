@@ -0,0 +1,170 @@
+import os
+import time
+from multiprocessing import resource_tracker
+
+import numpy as np
+import pytest
+
+import pypoplib.base_functions as bf
+import pypoplib.continuous_functions as cf
+from pypoplib.shifted_functions import generate_shift_vector
+from pypoplib.rotated_functions import generate_rotation_matrix
+from pypoplib.backends import _SINGLE_THREAD_ENV_VARS, _create_shared_array, InnerES, LocalBackend
+from pypoplib.dlmcma import DLMCMA
+
+
+@pytest.fixture
+def problem(tmp_path, monkeypatch):  # one rotated-shifted function with its data generated in the working directory
+    monkeypatch.chdir(tmp_path)
+    generate_shift_vector(cf.ellipsoid, 10, -9.5, 9.5, 1)
+    generate_rotation_matrix(cf.ellipsoid, 10, 1)
+    for k in ['pypop_shift_vector', 'pypop_rotation_matrix']:  # not to reuse data loaded by other tests
+        if hasattr(cf.ellipsoid, k):
+            delattr(cf.ellipsoid, k)
+    return {'fitness_function': cf.ellipsoid, 'ndim_problem': 10,
+            'upper_boundary': 10*np.ones((10,)), 'lower_boundary': -10*np.ones((10,))}
+
+
+def _new_dlmcma():
+    problem = {'fitness_function': bf.sphere, 'ndim_problem': 10,
+               'upper_boundary': 10*np.ones((10,)), 'lower_boundary': -10*np.ones((10,))}
+    options = {'max_runtime': 60, 'seed_rng': 1, 'n_inner_es': 5, 'runtime_inner_es': 10,
+               'backend': 'local', 'is_adaptive_runtime': True}
+    return DLMCMA(problem, options)
+
+
+def _adapt(dlmcma, y_bak, y, overhead=0.0):
+    dlmcma.best_so_far_y = y
+    dlmcma._adapt_runtime({'runtime': 10.0, 'overhead': overhead}, y_bak, np.ones((5,)))
+    return dlmcma._runtime_inner_es
+
+
+def test_adapt_runtime():
+    dlmcma = _new_dlmcma()
+    assert _adapt(dlmcma, np.Inf, 1.0) == 10  # not for the first cycle
+    assert _adapt(dlmcma, 1.0, 0.5) == 8  # the first adaptation can shorten one improving cycle
+    assert _adapt(dlmcma, 0.5, 0.3) == 6.4  # still keeping up with the (decayed) target rate
+    assert _adapt(dlmcma, 0.3, 0.3) == 8  # stagnation
+    assert _adapt(dlmcma, 0.3, 0.1, overhead=2.0) == 10  # too much overhead
+    assert _adapt(dlmcma, 0.1, 0.1) == 12.5
+
+
+def test_schedule_runtime():
+    dlmcma = _new_dlmcma()  # with 60 seconds and 10 seconds of each inner ES (adaptive)
+    dlmcma.start_time = time.time()
+    assert dlmcma._schedule_runtime(1) == 10
+    assert dlmcma._schedule_runtime(4) == 10  # 15 seconds for each of 4 rounds
+    assert 11 < dlmcma._schedule_runtime(5) <= 12  # to size the last cycle of 5 rounds exactly
+    assert dlmcma._schedule_runtime(30) is None  # less than the minimal runtime for each of 30 rounds
+    dlmcma._cycles.append({'overhead': 30.0})  # to reserve the overhead of the last cycle
+    assert 9 < dlmcma._schedule_runtime(3) <= 10
+
+
+def test_asynchronous_with_small_pool(problem):
+    options = {'max_runtime': 10, 'seed_rng': 1, 'n_inner_es': 10, 'runtime_inner_es': 3, 'verbose': False,
+               'backend': 'local', 'n_workers': 2, 'is_asynchronous': True}
+    results = DLMCMA(problem, options).optimize()
+    # no inner ES queued (rather than running) at termination is started
+    assert results['runtime'] < options['max_runtime'] + options['runtime_inner_es']
+    assert np.isfinite(results['best_so_far_y'])
+
+
+class _FailingBackend(LocalBackend):  # to fail the first inner ES finished (as if its worker was killed)
+    def __init__(self, n_workers):
+        LocalBackend.__init__(self, n_workers)
+        self._is_failed = False
+
+    def get(self, handles):
+        results = LocalBackend.get(self, handles)
+        if not self._is_failed:
+            self._is_failed = True
+            raise RuntimeError('worker unexpectedly exits')
+        return results
+
+
+def test_checkpoint_and_resume(problem, tmp_path):
+    options = {'max_runtime': 16, 'seed_rng': 1, 'n_inner_es': 5, 'runtime_inner_es': 3, 'verbose': False,
+               'backend': _FailingBackend(3), 'max_retries': 0, 'checkpoint': str(tmp_path / 'dlmcma.npz'),
+               'checkpoint_interval': 0.0}  # to save after each cycle (including the last one)
+    results = DLMCMA(problem, options).optimize()
+    assert len(results['cycles']) > 0 and len(results['failures']) == 1 and results['n_dropped_inner_es'] == 1
+    # to resume from the last checkpoint, which terminates at once (since its runtime is used up)
+    options = dict(options, backend='local', n_workers=1, resume_from=options['checkpoint'], checkpoint=None)
+    resumed = DLMCMA(problem, options).optimize()
+    for k in ['best_so_far_y', 'n_function_evaluations', 'cycles', 'failures', 'n_dropped_inner_es']:
+        assert resumed[k] == results[k]
+    assert np.array_equal(resumed['best_so_far_x'], results['best_so_far_x'])
+    assert np.array_equal(resumed['fitness'], results['fitness'])
+
+
+def test_local_backend_environ(problem, monkeypatch):  # to pin BLAS threads only while all workers are alive
+    monkeypatch.setenv('OMP_NUM_THREADS', '4')
+    monkeypatch.delenv('MKL_NUM_THREADS', raising=False)
+    environ = {k: os.environ.get(k) for k in _SINGLE_THREAD_ENV_VARS}
+    backend = LocalBackend(n_workers=1)
+    for _ in range(2):  # to be restarted
+        backend.start(problem, problem['fitness_function'], {'max_runtime': 1, 'verbose': False}, 2, 4)
+        assert all(os.environ.get(k) == v for k, v in _SINGLE_THREAD_ENV_VARS.items())
+        backend.shutdown()
+        assert {k: os.environ.get(k) for k in _SINGLE_THREAD_ENV_VARS} == environ
+
+
+def _generate_q_baseline(dlmcma, slots, q, m, options, order=None, recombined=None):  # baseline (stacked) `q`
+    q_ray = np.empty((len(slots), dlmcma.m_max, dlmcma.ndim_problem))
+    for k, i in enumerate(slots):
+        if recombined is None:
+            q_ray[k] = q[i]
+        elif i < dlmcma.n_outer:
+            q_ray[k] = q[order[i]]
+        elif i < dlmcma.n_outer*2:
+            q_ray[k] = (q[order[i - dlmcma.n_outer]] + recombined[3])/np.sqrt(2.0)
+        else:
+            q_ray[k] = recombined[3]
+    return [q_ray[k, -o['m']:] for k, o in enumerate(options)]
+
+
+@pytest.mark.parametrize('slots', [np.arange(10), np.array([1, 3, 4, 8])])
+def test_generate_options(slots):
+    dlmcma = _new_dlmcma()
+    dlmcma.n_inner_es, dlmcma.n_outer = 10, 2
+    dlmcma._w_outer = dlmcma._ww_outer = np.array([0.7, 0.3])
+    rng = np.random.default_rng(1)
+    x, p, q = rng.standard_normal((10, 10)), rng.standard_normal((10, 10)), rng.standard_normal((10, dlmcma.m_max, 10))
+    w, s, m = rng.random((10,)), rng.random((10,)), rng.integers(2, dlmcma.m_max + 1, (10,)).astype(float)
+    order = np.argsort(rng.random((10,)))[:2]
+    recombined = dlmcma._recombine(order, x, p, w, q, s, m)
+    for order, recombined in [(None, None), (order, recombined)]:  # for the first and next generations
+        options = dlmcma._generate_options(slots, x, p, w, q, s, m, order, recombined)
+        for i, o, qq in zip(slots, options, _generate_q_baseline(dlmcma, slots, q, m, options, order, recombined)):
+            assert o['q'].shape == (o['m'], 10) and np.array_equal(o['q'], qq) and not o['q'].flags.writeable
+            # to copy only for elitist and recombination (while all others are views)
+            is_copied = (recombined is not None) and (i < dlmcma.n_outer*2)
+            assert is_copied != np.shares_memory(o['q'], q if recombined is None else recombined[3])
+    q_bak = [o['q'].copy() for o in options]
+    q[:] = 0.0  # not to be changed after being generated (e.g., when resubmitted after others finish)
+    for o, qq in zip(options, q_bak):
+        assert np.array_equal(o['q'], qq)
+
+
+def test_inner_es_with_shared_q():  # to read the given `q` (written by the driver) and write the evolved `q` in place
+    problem = {'fitness_function': bf.sphere, 'ndim_problem': 10,
+               'upper_boundary': 10*np.ones((10,)), 'lower_boundary': -10*np.ones((10,))}
+    invariant = {'max_function_evaluations': 500, 'verbose': False, 'saving_fitness': 100}
+    memory, shared, specification = _create_shared_array((3, 6, 10))
+    try:
+        inner_es, baseline = InnerES(problem, bf.sphere, invariant, specification), InnerES(
+            problem, bf.sphere, invariant)
+        # to register it again, since it is unregistered by the inner ES (run in another process in practice)
+        resource_tracker.register(memory._name, 'shared_memory')
+        options = {'mean': np.ones((10,)), 'p': np.zeros((10,)), 'w': 0.0, 'sigma': 0.5, 'seed_rng': 1, 'm': 4,
+                   'q': np.random.default_rng(1).standard_normal((4, 10))}
+        shared[1, -4:] = options['q']
+        results = inner_es.optimize(dict(options, q=None), 1)
+        expected = baseline.optimize(dict(options))
+        assert results['q'] is None and np.array_equal(shared[1, -4:], expected['q'])
+        assert results['best_so_far_y'] == expected['best_so_far_y']
+        assert not np.any(shared[[0, 2]]) and not np.any(shared[1, :2])  # all other rows are not touched
+    finally:
+        del shared
+        memory.close()
+        memory.unlink()
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+import pypoplib.base_functions as bf
+from pypoplib.mmes import MMES
+
+
+def _new_options(d, m, **options):
+    rng = np.random.default_rng(d*m)
+    return dict({'seed_rng': 2022, 'm': m, 'mean': 3.0*np.ones((d,)), 'p': np.zeros((d,)), 'w': 0.0,
+                 'q': rng.standard_normal((m, d)), 'sigma': 0.3, 'verbose': False, 'saving_fitness': 1}, **options)
+
+
+def _new_problem(d):
+    return {'fitness_function': bf.ellipsoid, 'ndim_problem': d,
+            'lower_boundary': -5.0*np.ones((d,)), 'upper_boundary': 5.0*np.ones((d,))}
+
+
+def _sample_baseline(mmes, x, mean, q, v):  # baseline (per-offspring loop) sampling
+    for k in range(mmes._n_mirror_sampling):  # mirror sampling
+        zq = np.zeros((mmes.ndim_problem,))
+        for _ in range(mmes.ms):
+            j_k = v[(mmes.m - mmes.rng_optimization.geometric(mmes.c_a) % mmes.m) - 1]
+            zq += mmes.rng_optimization.standard_normal()*q[j_k]
+        z = mmes._z_1*mmes.rng_optimization.standard_normal((mmes.ndim_problem,))
+        z += mmes._z_2*zq
+        x[k] = mean + mmes.sigma*z
+        if (mmes._n_mirror_sampling + k) < mmes.n_individuals:
+            x[mmes._n_mirror_sampling + k] = mean - mmes.sigma*z
+    return x
+
+
+def _update_v_baseline(t, v, q, p, n_generations, m, distance):  # baseline (reallocating) update of `v`
+    if n_generations < m:
+        q[n_generations] = p
+        return v, None
+    k_star = np.argmin(t[v[1:]] - t[v[:(m - 1)]])
+    k_star += 1
+    if t[v[k_star]] - t[v[k_star - 1]] > distance:
+        k_star = 0
+    v = np.append(np.append(v[:k_star], v[(k_star + 1):]), v[k_star])
+    t[v[-1]], q[v[-1]] = n_generations, p
+    return v, k_star
+
+
+class _BaselineMMES(MMES):
+    def iterate(self, x=None, mean=None, q=None, v=None, y=None, args=None):
+        x = _sample_baseline(self, x, mean, q, v)
+        for k in range(self.n_individuals):
+            if self._check_terminations():
+                return x, y
+            y[k] = self._evaluate_fitness(x[k], args)
+        return x, y
+
+
+@pytest.mark.parametrize('d, m', [(4, 2), (10, 4), (10, 7), (50, 8)])
+def test_legacy_sampling(d, m):
+    mmes, baseline = MMES(_new_problem(d), _new_options(d, m, is_legacy_sampling=True)), MMES(
+        _new_problem(d), _new_options(d, m))
+    x, mean, _, _, q, _, v, _ = mmes.initialize()
+    x_baseline, rng = np.empty_like(x), np.random.default_rng(m)
+    for _ in range(20):  # with one random ring of indexes for each generation
+        v[:] = rng.permutation(m)
+        baseline.rng_optimization.bit_generator.state = mmes.rng_optimization.bit_generator.state  # same draws
+        baseline.sigma, baseline._n_mirror_sampling = mmes.sigma, mmes._n_mirror_sampling
+        x_baseline = _sample_baseline(baseline, x_baseline, mean, q, v)
+        assert np.array_equal(mmes._sample(x, mean, q, v), x_baseline)  # bit-for-bit
+
+
+@pytest.mark.parametrize('d, m', [(4, 2), (10, 4), (20, 9)])
+def test_legacy_sampling_run(d, m):
+    options = _new_options(d, m, max_function_evaluations=3000, is_legacy_sampling=True)
+    results = MMES(_new_problem(d), options).optimize()
+    results_baseline = _BaselineMMES(_new_problem(d), options).optimize()
+    assert results['best_so_far_y'] == results_baseline['best_so_far_y']
+    assert np.array_equal(results['best_so_far_x'], results_baseline['best_so_far_x'])
+    assert np.array_equal(results['fitness'], results_baseline['fitness'])  # all `y` of each generation
+    assert np.array_equal(results['q'], results_baseline['q'])
+
+
+@pytest.mark.parametrize('m, distance', [(2, 1), (2, 3), (5, 2), (5, 6), (8, 3), (8, 100)])
+def test_update_distribution(m, distance):
+    d = 10
+    mmes = MMES(_new_problem(d), _new_options(d, m, distance=distance))
+    x, mean, p, w, q, t, v, y = mmes.initialize()
+    t_baseline, v_baseline, q_baseline = np.copy(t), np.copy(v), np.copy(q)
+    rng, k_stars = np.random.default_rng(m), set()
+    for g in range(300):
+        x = rng.standard_normal(x.shape)
+        y_bak, y = np.copy(y), rng.standard_normal((len(y),))
+        mean, p, w, q, t, v = mmes._update_distribution(x, mean, p, w, q, t, v, y, y_bak)
+        v_baseline, k_star = _update_v_baseline(t_baseline, v_baseline, q_baseline, p, g, m, distance)
+        k_stars.add(k_star)
+        mmes._n_generations += 1
+        assert np.array_equal(v, v_baseline) and np.array_equal(t, t_baseline) and np.array_equal(q, q_baseline)
+        assert np.array_equal(mmes._gaps, t[v[1:]] - t[v[:-1]])
+    if distance < m:  # to cover all cases, i.e., the fill phase, the first, one middle, and the last index
+        assert k_stars.issuperset({None, 0, m - 1}) and (m == 2 or len(k_stars - {None, 0, m - 1}) > 0)
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+import pypoplib.base_functions as bf
+from pypoplib.optimizer import FitnessHistory
+from pypoplib.mmes import MMES
+
+
+def _compress_fitness_baseline(fitness, saving_fitness):  # baseline (list-based) compression of all fitness
+    fitness = np.array(fitness)
+    # arrange in non-increasing order
+    for i in range(len(fitness) - 1):
+        if fitness[i] < fitness[i + 1]:
+            fitness[i + 1] = fitness[i]
+    if saving_fitness == 1:
+        return np.stack((np.arange(1, len(fitness) + 1), fitness), 1)
+    # use 1-based index
+    index = np.arange(1, len(fitness), saving_fitness)
+    # recover 0-based index via - 1
+    index = np.append(index, len(fitness)) - 1
+    compressed = np.stack((index, fitness[index]), 1)
+    # recover 1-based index
+    compressed[0, 0], compressed[-1, 0] = 1, len(fitness)
+    return compressed
+
+
+def _record(saving_fitness, n_individuals, max_function_evaluations, chunk_size=4096, n_resumed=None):
+    """Record the same stream of fitness (generation by generation) both as one list and online."""
+    rng = np.random.default_rng(saving_fitness*n_individuals + max_function_evaluations)
+    fitness, history = [], FitnessHistory(saving_fitness, chunk_size)
+    n_function_evaluations, n_generations = 0, 0
+    while n_function_evaluations < max_function_evaluations:
+        y = 10.0*rng.standard_normal((n_individuals,)) + 100.0/(n_generations + 1)
+        # only the first `max_function_evaluations` are evaluated (the last generation may be partial)
+        n_function_evaluations = min(n_function_evaluations + n_individuals, max_function_evaluations)
+        fitness.extend(y)  # as done before (to be truncated only at the end)
+        history.append(y, n_function_evaluations)
+        n_generations += 1
+        if n_generations == n_resumed:  # to save and then load its state (as checkpoints do)
+            state = history.get_state()
+            history = FitnessHistory(saving_fitness, chunk_size)
+            history.set_state(state['fitness'], state['n_fitness'], state['best_fitness'])
+    return fitness[:n_function_evaluations], history
+
+
+@pytest.mark.parametrize('saving_fitness', [1, 2, 3, 7, 100, 2000])
+@pytest.mark.parametrize('n_individuals', [1, 4, 13])
+def test_fitness_history(saving_fitness, n_individuals):
+    for max_function_evaluations in [1, 2, 7, 100, 101, 1000, 5003]:  # with or without one partial generation
+        for chunk_size, n_resumed in [(4096, None), (3, None), (5, 2)]:
+            fitness, history = _record(saving_fitness, n_individuals, max_function_evaluations, chunk_size,
+                                       n_resumed)
+            assert len(fitness) == history.n_fitness == max_function_evaluations  # truncated by `n_max`
+            compressed = history.compress()
+            assert np.array_equal(compressed, _compress_fitness_baseline(fitness, saving_fitness))
+            assert history.best_fitness == np.min(fitness) == compressed[-1, 1]
+            assert len(history.get_rows()) <= int(np.ceil(max_function_evaluations/saving_fitness))
+
+
+def test_fitness_history_with_n_max():
+    history = FitnessHistory(2)
+    history.append([5.0, 4.0, 6.0], 2)  # only the first 2 fitness are recorded
+    history.append(3.0, 2)  # not evaluated at all
+    history.append([1.0, 0.0], 3)
+    assert history.n_fitness == 3 and history.best_fitness == 1.0
+    assert np.array_equal(history.compress(), _compress_fitness_baseline([5.0, 4.0, 1.0], 2))
+    assert FitnessHistory(2).compress() is None
+
+
+@pytest.mark.parametrize('saving_fitness', [1, 3, 50])
+def test_saving_fitness(monkeypatch, saving_fitness):  # online compression of one optimizer against all its fitness
+    fitness, append = [], FitnessHistory.append
+
+    def record(self, y, n_max=None):  # to record the same stream as done before (i.e., all fitness)
+        fitness.extend(np.atleast_1d(y))
+        append(self, y, n_max)
+    monkeypatch.setattr(FitnessHistory, 'append', record)
+    d = 10
+    options = {'seed_rng': 2022, 'm': 4, 'mean': 3.0*np.ones((d,)), 'p': np.zeros((d,)), 'w': 0.0,
+               'q': np.random.default_rng(d).standard_normal((4, d)), 'sigma': 0.3, 'verbose': False,
+               'saving_fitness': saving_fitness, 'max_function_evaluations': 1003}  # with one partial generation
+    mmes = MMES({'fitness_function': bf.ellipsoid, 'ndim_problem': d,
+                 'lower_boundary': -5.0*np.ones((d,)), 'upper_boundary': 5.0*np.ones((d,))}, options)
+    assert (1003 - 1) % mmes.n_individuals != 0  # including the initial mean
+    results = mmes.optimize()
+    assert results['n_function_evaluations'] == 1003 < len(fitness)
+    assert np.array_equal(results['fitness'], _compress_fitness_baseline(fitness[:1003], saving_fitness))
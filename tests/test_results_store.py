@@ -0,0 +1,51 @@
+import numpy as np
+
+from pypoplib.results_store import ResultsStore
+from pypoplib.convergence import aggregate
+
+
+def _append(store, index, n):
+    results = {'best_so_far_y': float(index), 'n_function_evaluations': 10.0*n, 'runtime': 1.0,
+               'fitness': np.stack((np.arange(n) + 1.0, np.arange(n) + index), axis=1)}
+    store.append('MMES', 'sphere', 10, index, results)
+    return results['fitness']
+
+
+def test_read_curves(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    fitness = [_append(store, i, n) for i, n in enumerate([3, 0, 5])]
+    for curve, f in zip(store.read_curves(store.read()), fitness):
+        assert np.array_equal(curve, f)
+
+
+def test_read_curves_with_partial_curve(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    fitness = [_append(store, i, n) for i, n in enumerate([3, 5])]
+    with open(tmp_path / 'curves.bin', 'ab') as handle:  # one partial curve being appended (not committed)
+        handle.write(b'\x00'*12)
+    for curve, f in zip(store.read_curves(store.read()), fitness):
+        assert np.array_equal(curve, f)
+    fitness.append(_append(store, 2, 4))  # the partial curve is truncated by the next writer
+    for curve, f in zip(store.read_curves(store.read()), fitness):
+        assert np.array_equal(curve, f)
+    with open(tmp_path / 'curves.bin', 'r+b') as handle:  # one orphaned curve of one killed writer
+        handle.seek(0, 2)
+        handle.write(b'\x00'*(16*7 + 8))
+    for curve, f in zip(store.read_curves(store.read()), fitness):
+        assert np.array_equal(curve, f)
+
+
+def test_signature(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results'))
+    signatures = [store.signature()]
+    assert signatures[0] == [str(tmp_path / 'results'), None, None]
+    results = [aggregate(store, 'sphere', ['MMES'], cache=str(tmp_path / 'cache'))]
+    for i, n in enumerate([3, 5]):
+        _append(store, i, n)
+        signatures.append(store.signature())
+        assert signatures[-1] != signatures[-2]  # whenever one run is appended
+        results.append(aggregate(store, 'sphere', ['MMES'], cache=str(tmp_path / 'cache')))
+        assert len(results[-1]['MMES']['end_fitness']) == i + 1  # not reused from the cache
+        cached = aggregate(store, 'sphere', ['MMES'], cache=str(tmp_path / 'cache'))
+        assert np.array_equal(cached['MMES']['end_fitness'], results[-1]['MMES']['end_fitness'])
+    assert ResultsStore(str(tmp_path / 'results')).signature() == signatures[-1]
@@ -0,0 +1,57 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from pypoplib.rotated_functions import generate_rotation_matrix
+from pypoplib.structured_rotations import HouseholderRotation, DCTRotation, rotate
+
+
+def _generate_by_gram_schmidt(ndim, seed):  # baseline implementation (before `method` was added)
+    rotation_matrix = np.random.default_rng(seed).standard_normal(size=(ndim, ndim))
+    for i in range(ndim):
+        for j in range(i):
+            rotation_matrix[:, i] -= np.dot(rotation_matrix[:, i], rotation_matrix[:, j]) * rotation_matrix[:, j]
+        rotation_matrix[:, i] /= np.linalg.norm(rotation_matrix[:, i])
+    return rotation_matrix
+
+
+def test_qr(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # all generated rotation matrices are stored in the working directory
+    for ndim in [1, 2, 10, 100]:
+        r = generate_rotation_matrix('sphere', ndim, 1)
+        assert r.shape == (ndim, ndim)
+        assert np.allclose(np.dot(r.T, r), np.eye(ndim), rtol=0.0, atol=1e-12)
+        assert np.array_equal(r, generate_rotation_matrix('sphere', ndim, 1))  # same seed
+        assert np.array_equal(r, np.load(tmp_path / 'pypop_benchmarks_input_data' /
+                                          'rotation_matrix_sphere_dim_{:d}.npy'.format(ndim)))
+    assert not np.allclose(generate_rotation_matrix('sphere', 10, 1), generate_rotation_matrix('sphere', 10, 2))
+
+
+def test_gram_schmidt(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for ndim in [1, 2, 10, 100]:
+        for seed in [0, 1, 2022]:
+            assert np.array_equal(generate_rotation_matrix('sphere', ndim, seed, method='gram_schmidt'),
+                                  _generate_by_gram_schmidt(ndim, seed))  # bit-for-bit
+
+
+@pytest.mark.parametrize('rotation', [HouseholderRotation, DCTRotation])
+def test_structured_rotation(rotation):
+    for ndim in [1, 2, 3, 4, 5, 10, 33, 64]:
+        for seed in range(4):
+            r = rotation(ndim, seed)
+            dense = r.to_dense()
+            assert np.allclose(np.dot(dense.T, dense), np.eye(ndim), rtol=0.0, atol=1e-12)
+            assert np.isclose(np.linalg.det(dense), 1.0)  # a proper rotation (rather than a reflection)
+            x = np.random.default_rng(seed).standard_normal((7, ndim))
+            y = rotate(r, x)  # batch
+            assert y.shape == x.shape
+            for xx, yy in zip(x, y):  # one by one
+                np.testing.assert_allclose(rotate(r, xx), yy, rtol=1e-12, atol=1e-12)
+                np.testing.assert_allclose(np.dot(dense, xx), yy, rtol=1e-12, atol=1e-12)
+            r_pickled = pickle.loads(pickle.dumps(r))  # regenerated from its seed
+            assert type(r_pickled) is rotation and r_pickled.shape == (ndim, ndim)
+            assert np.array_equal(r_pickled.rotate(x), y)
+    with pytest.raises(TypeError):
+        rotation(3, 1).rotate(np.ones((4,)))
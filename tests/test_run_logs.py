@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+
+from pypoplib.run_logs import build_index, read_index
+
+
+_FOLDER = os.path.join(os.path.dirname(__file__), 'fixtures', 'logs')
+
+
+def _get(index, optimizer, function, i):
+    return index[(index['optimizer'] == optimizer) & (index['function'] == function) & (index['index'] == i)][0]
+
+
+def test_stitch_split_runs():
+    index = build_index(_FOLDER)
+    assert len(index) == 5
+    r = _get(index, 'DLMCMA', 'cigar', 1)  # crashed in the first segment and completed in the second
+    assert r['is_completed'] and r['n_segments'] == 2 and r['runtime'] == 1.81689e+03
+    assert np.isnan(r['best_so_far_y'])  # not printed by old logs
+    assert _get(index, 'DLMCMA', 'discus', 1)['n_segments'] == 1
+
+
+def test_worker_failures():
+    index = build_index(_FOLDER)
+    # the report (printed before it) and the error of one crash are charged once to the experiment crashed
+    assert _get(index, 'DLMCMA', 'sphere', 1)['n_worker_failures'] == 0
+    assert _get(index, 'DLMCMA', 'cigar', 1)['n_worker_failures'] == 1
+    assert _get(index, 'DLMCMA', 'discus', 1)['n_worker_failures'] == 0
+    # one crash with only the report of "Worker unexpectedly exits" (without any error raised)
+    assert _get(index, 'MMES', 'sphere', 2)['n_worker_failures'] == 0
+    r = _get(index, 'MMES', 'cigar', 2)
+    assert not r['is_completed'] and r['n_worker_failures'] == 1 and np.isnan(r['runtime'])
+
+
+def test_read_index(tmp_path):
+    index_file = str(tmp_path / 'index.npy')
+    index = read_index(_FOLDER, index_file, function='cigar')
+    assert os.path.exists(index_file) and len(index) == 2
+    columns = ['optimizer', 'function', 'index', 'n_worker_failures', 'is_completed']  # (without `NaN`)
+    assert np.array_equal(read_index(_FOLDER, index_file, columns), build_index(_FOLDER)[columns])